@@ -0,0 +1,397 @@
+import ast
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+
+from config import (
+    RUN_MEMORY_LIMIT_BYTES,
+    RUN_TESTS_CACHE_DIR,
+    RUN_TESTS_PATTERN,
+    RUN_TESTS_WORKERS,
+    RUN_TIMEOUT_SECONDS,
+)
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "unittest_worker.py")
+SKIP_DIRS = {"__pycache__", ".git", ".agent_cache", ".venv", "venv"}
+# Outcomes a later run can reuse as long as nothing the test imports has changed.
+# Failures and errors are always run again.
+REUSABLE_OUTCOMES = {"passed", "skipped"}
+# Assumed for a test that has never run, when spreading tests over workers
+DEFAULT_DURATION = 0.01
+CACHE_VERSION = 1
+
+
+class SourceFile:
+    """One .py file version: its content hash and the imports found in it."""
+
+    __slots__ = ("signature", "digest", "imports")
+
+    def __init__(self, signature, digest, imports):
+        self.signature = signature
+        self.digest = digest
+        self.imports = imports
+
+
+def _parse_imports(source):
+    """(level, module, names) for every import statement, with level 0 for absolute imports."""
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return []
+    imports = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imports += [(0, alias.name, ()) for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            imports.append((node.level, node.module or "", tuple(alias.name for alias in node.names)))
+    return imports
+
+
+def find_test_cases(source):
+    """Class.method names of the unittest cases defined in a test file's source.
+
+    A class counts if it has test* methods (its own or from base classes in the
+    same file) and derives from something, as TestCase subclasses do.
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return []
+    classes = {node.name: node for node in tree.body if isinstance(node, ast.ClassDef)}
+
+    def methods(node, seen):
+        names = [item.name for item in node.body
+                 if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and item.name.startswith("test")]
+        for base in node.bases:
+            if isinstance(base, ast.Name) and base.id in classes and base.id not in seen:
+                names += methods(classes[base.id], seen | {base.id})
+        return names
+
+    cases = []
+    for name, node in classes.items():
+        if node.bases:
+            cases += [f"{name}.{method}" for method in dict.fromkeys(methods(node, {name}))]
+    return cases
+
+
+class AffectedTests:
+    """Which unittest cases under one directory need to run again, and running them.
+
+    An import map of every .py file is kept (parsed with ast, re-read only when a
+    file's mtime or size changes). A test file's fingerprint hashes the contents
+    of everything it imports from the tree, directly or not. Results are kept on
+    disk with the fingerprint they ran under, so a case is only run again once
+    its file or something it imports has changed. Cases run in parallel worker
+    processes, each taking whole classes so setUpClass runs once per class.
+    """
+
+    def __init__(self, root, cache_dir=RUN_TESTS_CACHE_DIR):
+        self.root = os.path.realpath(root)
+        digest = hashlib.sha1(self.root.encode()).hexdigest()[:16]
+        self.cache_path = os.path.join(cache_dir, f"test-results-{digest}.json")
+        self.lock = threading.Lock()
+        self.files = {}  # rel_path -> SourceFile
+        self.written = set()  # rel_paths written by the agent since the last run
+        self.results = None  # test id -> {"fingerprint", "outcome", "duration"}
+        self.digests = {}  # rel_path -> content hash at the last run
+        self.overhead = 0.0  # seconds a worker spends outside the tests themselves
+
+    # --- import map ---
+
+    def _source(self, rel_path):
+        path = os.path.join(self.root, rel_path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+        known = self.files.get(rel_path)
+        if known is not None and known.signature == signature:
+            return known
+        with open(path, "rb") as file:
+            data = file.read()
+        source = SourceFile(signature, hashlib.sha1(data).hexdigest(), _parse_imports(data))
+        self.files[rel_path] = source
+        return source
+
+    def _module_file(self, directory, dotted):
+        """The file in the tree a module name resolves to from directory, or None."""
+        base = os.path.join(directory, *dotted.split(".")) if dotted else directory
+        for candidate in (base + ".py", os.path.join(base, "__init__.py")):
+            rel_path = os.path.normpath(os.path.relpath(candidate, self.root))
+            if not rel_path.startswith("..") and os.path.isfile(candidate):
+                return rel_path
+        return None
+
+    def _dependencies(self, rel_path, test_dir):
+        """Files of the tree that rel_path imports directly, including the packages on the way."""
+        source = self._source(rel_path)
+        if source is None:
+            return []
+        directory = os.path.dirname(os.path.join(self.root, rel_path))
+        # Absolute imports are looked up where `python3 test_file.py` would: the test's directory, then the root
+        search = [test_dir, self.root]
+        found = []
+        for level, module, names in source.imports:
+            if level:
+                package = directory
+                for _ in range(level - 1):
+                    package = os.path.dirname(package)
+                roots = [package]
+            else:
+                roots = search
+            parts = module.split(".") if module else []
+            for root in roots:
+                hits = [self._module_file(root, ".".join(parts[:i])) for i in range(1, len(parts) + 1)]
+                # `from package import module` imports a submodule
+                hits += [self._module_file(root, ".".join(parts + [name])) for name in names]
+                if level and not parts:
+                    hits.append(self._module_file(root, ""))
+                hits = [hit for hit in hits if hit]
+                if hits:
+                    found += hits
+                    break
+        return found
+
+    def closure(self, test_file):
+        """test_file plus every file of the tree it imports, directly or not."""
+        test_dir = os.path.dirname(os.path.join(self.root, test_file))
+        seen = {test_file}
+        pending = [test_file]
+        while pending:
+            for dependency in self._dependencies(pending.pop(), test_dir):
+                if dependency not in seen:
+                    seen.add(dependency)
+                    pending.append(dependency)
+        return sorted(seen)
+
+    def fingerprint(self, files):
+        digest = hashlib.sha1()
+        for rel_path in files:
+            source = self._source(rel_path)
+            digest.update(f"{rel_path}:{source.digest if source else '-'}\n".encode())
+        return digest.hexdigest()
+
+    def test_files(self, under="."):
+        start = os.path.join(self.root, under)
+        if os.path.isfile(start):
+            return [os.path.relpath(start, self.root)]
+        found = []
+        for directory, dirs, files in os.walk(start):
+            dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS and not d.startswith("."))
+            for name in sorted(files):
+                if fnmatch(name, RUN_TESTS_PATTERN):
+                    found.append(os.path.relpath(os.path.join(directory, name), self.root))
+        return found
+
+    # --- results kept between runs ---
+
+    def notify_write(self, rel_path=None):
+        """A tool wrote rel_path (None: possibly anything); hash it again on the next run."""
+        with self.lock:
+            if rel_path is None:
+                self.files.clear()
+            else:
+                self.written.add(os.path.normpath(rel_path))
+
+    def _load(self):
+        if self.results is not None:
+            return
+        self.results, self.digests = {}, {}
+        try:
+            with open(self.cache_path) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == CACHE_VERSION and data.get("root") == self.root:
+            self.results, self.digests, self.overhead = data["results"], data["digests"], data["overhead"]
+
+    def _save(self):
+        from functions.write_file import write_atomic
+
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        write_atomic(self.cache_path, json.dumps(
+            {
+                "version": CACHE_VERSION,
+                "root": self.root,
+                "results": self.results,
+                "digests": self.digests,
+                "overhead": self.overhead,
+            }
+        ))
+
+    # --- running ---
+
+    def run(self, under=".", run_all=False, timeout=RUN_TIMEOUT_SECONDS, workers=RUN_TESTS_WORKERS):
+        """Run the affected cases of the test files under a path and return a TestRun.
+
+        timeout applies to each worker process.
+        """
+        with self.lock:
+            self._load()
+            start = time.perf_counter()
+            written, self.written = self.written, set()
+            for rel_path in written:
+                self.files.pop(rel_path, None)
+
+            test_run = TestRun()
+            to_run = {}  # test id -> fingerprint
+            changed = set()
+            for test_file in self.test_files(under):
+                with open(os.path.join(self.root, test_file), "rb") as file:
+                    cases = find_test_cases(file.read())
+                if not cases:
+                    continue
+                files = self.closure(test_file)
+                fingerprint = self.fingerprint(files)
+                for rel_path in files:
+                    source = self._source(rel_path)
+                    if source and self.digests.get(rel_path) not in (None, source.digest):
+                        changed.add(rel_path)
+                    if source:
+                        self.digests[rel_path] = source.digest
+                for case in cases:
+                    test_id = f"{test_file}::{case}"
+                    cached = self.results.get(test_id)
+                    if (not run_all and cached and cached["fingerprint"] == fingerprint
+                            and cached["outcome"] in REUSABLE_OUTCOMES):
+                        test_run.cached[test_id] = cached
+                    else:
+                        to_run[test_id] = fingerprint
+
+            test_run.changed = sorted(changed)
+            test_run.written = sorted(written)
+            test_run.workers = self._run_cases(to_run, timeout, workers, test_run)
+            for record in test_run.ran.values():
+                if record["id"] in to_run:
+                    self.results[record["id"]] = {
+                        "fingerprint": to_run[record["id"]],
+                        "outcome": record["outcome"],
+                        "duration": record["duration"],
+                    }
+            test_run.overhead = self.overhead
+            test_run.wall_time = time.perf_counter() - start
+            self._save()
+            return test_run
+
+    def _run_cases(self, to_run, timeout, workers, test_run):
+        """Spread the cases over worker processes, whole classes at a time, longest first."""
+        classes = {}
+        for test_id in to_run:
+            classes.setdefault(test_id.rsplit(".", 1)[0], []).append(test_id)
+
+        def duration(test_id):
+            return (self.results.get(test_id) or {}).get("duration", DEFAULT_DURATION)
+
+        workers = max(1, min(workers, len(classes)))
+        chunks = [[] for _ in range(workers)]
+        loads = [0.0] * workers
+        for ids in sorted(classes.values(), key=lambda ids: -sum(map(duration, ids))):
+            lightest = loads.index(min(loads))
+            chunks[lightest] += ids
+            loads[lightest] += sum(map(duration, ids))
+
+        overheads = []
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for records, problem, elapsed in pool.map(lambda ids: self._run_chunk(ids, timeout), [c for c in chunks if c]):
+                for record in records:
+                    test_run.ran[record["id"]] = record
+                if problem:
+                    test_run.problems.append(problem)
+                else:
+                    overheads.append(elapsed - sum(record["duration"] for record in records))
+        if overheads:
+            self.overhead = max(0.0, min(overheads))
+        return workers if to_run else 0
+
+    def _run_chunk(self, test_ids, timeout):
+        from functions.run_python_file import _collect_output, cpu_limit_for
+        from python_pool import start_python
+
+        fd, results_path = tempfile.mkstemp(prefix="run_tests-", suffix=".json")
+        os.close(fd)
+        start = time.perf_counter()
+        try:
+            process = start_python(
+                WORKER_SCRIPT,
+                [results_path] + test_ids,
+                cwd=self.root,
+                cpu_limit=cpu_limit_for(timeout),
+                memory_limit=RUN_MEMORY_LIMIT_BYTES,
+                wait_for_pool=False,
+            )
+            try:
+                stdout, stderr, timed_out = _collect_output(process, timeout)
+            finally:
+                process.close()
+                returncode = process.wait()
+            try:
+                with open(results_path) as file:
+                    records = json.load(file)
+            except (OSError, ValueError):
+                records = []
+        finally:
+            os.unlink(results_path)
+
+        problem = None
+        if timed_out or not records:
+            reason = f"timed out after {timeout:g} seconds" if timed_out else f"exited with code {returncode}"
+            problem = f"A test worker {reason} running {len(test_ids)} tests:\n{(stdout + stderr).strip()}"
+        missing = set(test_ids) - {record["id"] for record in records}
+        records += [
+            {"id": test_id, "outcome": "error", "duration": 0.0, "details": "did not run (see the errors above)"}
+            for test_id in sorted(missing)
+        ]
+        return records, problem, time.perf_counter() - start
+
+
+class TestRun:
+    """What one run_tests call ran, reused and found."""
+
+    # Not a test case, whatever unittest discovery thinks of the name
+    __test__ = False
+
+    def __init__(self):
+        self.ran = {}  # test id -> record
+        self.cached = {}  # test id -> cached result
+        self.changed = []
+        self.written = []
+        self.problems = []
+        self.workers = 0
+        self.overhead = 0.0
+        self.wall_time = 0.0
+
+    @property
+    def failed(self):
+        return [record for record in self.ran.values() if record["outcome"] in ("failure", "error")]
+
+    def full_run_estimate(self):
+        """Seconds running every case in one process would take, from the durations measured so far."""
+        tests = sum(record["duration"] for record in list(self.ran.values()) + list(self.cached.values()))
+        return tests + self.overhead
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_affected_tests(working_directory):
+    root = os.path.realpath(working_directory)
+    with _indexes_lock:
+        if root not in _indexes:
+            _indexes[root] = AffectedTests(root)
+        return _indexes[root]
+
+
+def notify_write(working_directory, rel_path=None):
+    """Tell the tracker for working_directory that a tool wrote rel_path (None: anything)."""
+    root = os.path.realpath(working_directory)
+    with _indexes_lock:
+        tracker = _indexes.get(root)
+    if tracker:
+        tracker.notify_write(rel_path)
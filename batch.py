@@ -0,0 +1,114 @@
+import asyncio
+import contextlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+from config import WORKING_DIR
+
+
+def read_prompts(path):
+    """Read a prompts file: one JSON object (or plain JSON string) per line.
+
+    Objects have a "prompt" and optionally an "id" (default: the line number),
+    a "working_directory" (default: WORKING_DIR) and a "replay" transcript to
+    answer from instead of the live model.
+    """
+    jobs = []
+    with open(path) as file:
+        for number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            job = json.loads(line)
+            if isinstance(job, str):
+                job = {"prompt": job}
+            job["id"] = str(job.get("id", number))
+            jobs.append(job)
+    return jobs
+
+
+def prepare_working_directory(job, isolate_dir=None):
+    """The session's working directory: the job's own, or a fresh copy of it under isolate_dir."""
+    working_directory = job.get("working_directory") or WORKING_DIR
+    if not isolate_dir:
+        return working_directory
+    # mkdtemp keeps the name unique even when two ids sanitize alike ("a/b", "a_b")
+    copy = tempfile.mkdtemp(prefix=re.sub(r"[^\w.-]", "_", job["id"]) + "-", dir=isolate_dir)
+    shutil.copytree(working_directory, copy, dirs_exist_ok=True)
+    return copy
+
+
+async def run_batch(jobs, make_backend, output, verbose=False, options=None):
+    """Run one agent session per job concurrently and write a JSONL record as each one ends.
+
+    make_backend(job) returns the backend a session talks to. At most
+    options["concurrency"] sessions run at once.
+    """
+    from main import run_session_async
+
+    options = options or {}
+    semaphore = asyncio.Semaphore(options.get("concurrency") or 1)
+
+    async def run_one(job):
+        async with semaphore:
+            record = {"id": job["id"], "prompt": job.get("prompt")}
+            start = time.perf_counter()
+            try:
+                backend = make_backend(job)
+                prompt = record["prompt"] = job.get("prompt") or backend.prompt
+                # Copying a tree can take a while; don't stall the other sessions meanwhile
+                working_directory = await asyncio.to_thread(prepare_working_directory, job, options.get("isolate"))
+                record["working_directory"] = working_directory
+                stats = await run_session_async(backend, prompt, verbose, options, working_directory)
+                record.update(stats.as_dict())
+            except Exception as e:
+                record["error"] = f"{type(e).__name__}: {e}"
+                record["finished"] = False
+                record["wall_time"] = time.perf_counter() - start
+        output.write(json.dumps(record) + "\n")
+        output.flush()
+        return record
+
+    return await asyncio.gather(*(run_one(job) for job in jobs))
+
+
+def main_batch(verbose, options):
+    """--batch: run every prompt in options["batch"] and stream the results as JSONL."""
+    from model_backend import GeminiBackend, ReplayBackend
+
+    jobs = read_prompts(options["batch"])
+    shared = {}
+
+    def make_backend(job):
+        if job.get("replay"):
+            return ReplayBackend(job["replay"], latency=options.get("replay_latency"))
+        if "gemini" not in shared:
+            # One client and scheduler for every session, so they share the rate limits
+            shared["gemini"] = GeminiBackend(api_key=os.environ.get("GEMINI_API_KEY"), verbose=verbose)
+        return shared["gemini"]
+
+    if options.get("isolate"):
+        os.makedirs(options["isolate"], exist_ok=True)
+
+    start = time.perf_counter()
+    if options.get("output") in (None, "-"):
+        # Results own stdout; the sessions' progress output goes to stderr
+        output = sys.stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            records = asyncio.run(run_batch(jobs, make_backend, output, verbose, options))
+    else:
+        with open(options["output"], "w") as output:
+            records = asyncio.run(run_batch(jobs, make_backend, output, verbose, options))
+
+    finished = sum(1 for record in records if record.get("finished"))
+    errors = sum(1 for record in records if "error" in record)
+    print(
+        f"{len(records)} sessions: {finished} finished, {errors} failed, "
+        f"{len(records) - finished - errors} hit the iteration limit "
+        f"({time.perf_counter() - start:.2f}s, concurrency {options.get('concurrency')})",
+        file=sys.stderr,
+    )
@@ -0,0 +1,631 @@
+import contextlib
+import io
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+from config import MAX_TOOL_WORKERS, WORKING_DIR
+
+
+def print_usage():
+    print("Usage: python benchmark.py sessions <transcript.jsonl>... [options]")
+    print("       python benchmark.py run-overhead [--runs N]")
+    print("       python benchmark.py sandbox [--runs N]")
+    print("       python benchmark.py startup [--runs N] [--budget MS]")
+    print("       python benchmark.py metrics <metrics.jsonl>...")
+    print("       python benchmark.py suite [--scale small|large] [--runs N] [--only PREFIX,...] [--save PATH]")
+    print("       python benchmark.py compare <baseline.json> [<current.json>] [--threshold PCT] [--runs N] [--save PATH]")
+    print("")
+    print("sessions: replays recorded sessions against a fresh copy of the calculator")
+    print("working directory and reports where the wall time went.")
+    print("  --repeat N              run every transcript N times (default 1)")
+    print("  --latency SECONDS       simulated model latency per call (default: as recorded)")
+    print("  --max-tool-workers N    tool calls run at once per model turn")
+    print("  --verbose               show the agent output instead of hiding it")
+    print("")
+    print("run-overhead: per-run cost of run_python_file's warm interpreter pool")
+    print("compared with starting a fresh interpreter with subprocess.run.")
+    print("  --runs N                runs per script and method (default 20)")
+    print("")
+    print("sandbox: per-call cost of resolving and checking a tool's path: the old")
+    print("abspath + startswith check, an uncached realpath check, and sandbox.py's")
+    print("memoized resolve; stat by absolute path against stat relative to the dir fd;")
+    print("and the whole path check plus stat a tool call makes, old and new.")
+    print("  --runs N                calls per path and method (default 20000)")
+    print("")
+    print("startup: how long `import main` takes in a fresh interpreter (python -X importtime),")
+    print("the slowest modules, and whether it fits in STARTUP_BUDGET_MS.")
+    print("  --runs N                fresh interpreters to measure (default 10)")
+    print("  --budget MS             budget to check against (default from config.py)")
+    print("")
+    print("metrics: totals across every session in files written by main.py --metrics,")
+    print("and where their time went by span (model calls, rate-limit waits, each tool).")
+    print("")
+    print("suite: times the tools, call_function's dispatch and the calculator against")
+    print("synthetic fixtures (a directory with many entries, a multi-GB sparse log file,")
+    print("a noisy script, a long expression stream) sized by BENCHMARK_SCALES.")
+    print("  --scale NAME            fixture sizes from config.py (default small)")
+    print("  --runs N                timings per metric; the median is kept (default 5)")
+    print("  --only PREFIX,...       only metrics starting with these, e.g. get_file_content")
+    print("  --save PATH             write the results as a JSON baseline")
+    print("")
+    print("compare: fails if any metric's median got more than the threshold slower than")
+    print("in the baseline. Without a second file the suite is run now at the baseline's scale.")
+    print("  --threshold PCT         allowed slowdown in percent (default BENCHMARK_THRESHOLD)")
+
+
+def run_replayed_session(transcript, latency=None, options=None, verbose=False):
+    """Replay one transcript against a scratch copy of WORKING_DIR and return its SessionStats."""
+    from main import run_session
+    from model_backend import ReplayBackend
+
+    backend = ReplayBackend(transcript, latency=latency)
+    with tempfile.TemporaryDirectory() as scratch:
+        working_directory = os.path.join(scratch, os.path.basename(os.path.abspath(WORKING_DIR)))
+        shutil.copytree(WORKING_DIR, working_directory)
+
+        output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(io.StringIO())
+        with output:
+            return run_session(backend, backend.prompt, verbose, options, working_directory)
+
+
+def benchmark_sessions(argv):
+    transcripts = []
+    repeat = 1
+    latency = None
+    verbose = False
+    options = {"max_tool_workers": MAX_TOOL_WORKERS}
+
+    args = iter(argv)
+    for arg in args:
+        if arg == "--repeat":
+            repeat = int(next(args))
+        elif arg == "--latency":
+            latency = float(next(args))
+        elif arg == "--max-tool-workers":
+            options["max_tool_workers"] = int(next(args))
+        elif arg in ["--verbose", "-v"]:
+            verbose = True
+        else:
+            transcripts.append(arg)
+    if not transcripts:
+        print_usage()
+        return 1
+
+    header = f"{'session':<32} {'wall s':>8} {'model s':>8} {'tool s':>8} {'iters':>6} {'calls':>6} {'prompt tok':>11} {'resp tok':>9}"
+    print(header)
+    print("-" * len(header))
+
+    totals = {"wall_time": 0.0, "model_time": 0.0, "tool_time": 0.0, "iterations": 0,
+              "tool_calls": 0, "prompt_tokens": 0, "response_tokens": 0}
+    runs = 0
+    start = time.perf_counter()
+    for transcript in transcripts:
+        for _ in range(repeat):
+            stats = run_replayed_session(transcript, latency, options, verbose)
+            runs += 1
+            for key in totals:
+                totals[key] += getattr(stats, key)
+            name = os.path.basename(transcript) + ("" if stats.finished else " (unfinished)")
+            print(
+                f"{name[:32]:<32} {stats.wall_time:>8.3f} {stats.model_time:>8.3f} {stats.tool_time:>8.3f} "
+                f"{stats.iterations:>6} {stats.tool_calls:>6} {stats.prompt_tokens:>11} {stats.response_tokens:>9}"
+            )
+
+    print("-" * len(header))
+    print(
+        f"{f'total ({runs} runs)':<32} {totals['wall_time']:>8.3f} {totals['model_time']:>8.3f} {totals['tool_time']:>8.3f} "
+        f"{totals['iterations']:>6} {totals['tool_calls']:>6} {totals['prompt_tokens']:>11} {totals['response_tokens']:>9}"
+    )
+    if totals["wall_time"]:
+        other = totals["wall_time"] - totals["model_time"] - totals["tool_time"]
+        print(
+            f"model {totals['model_time'] / totals['wall_time']:.0%}, "
+            f"tools {totals['tool_time'] / totals['wall_time']:.0%}, "
+            f"agent overhead {other / totals['wall_time']:.0%} "
+            f"(benchmark took {time.perf_counter() - start:.2f}s)"
+        )
+    return 0
+
+
+RUN_OVERHEAD_SCRIPTS = {
+    "empty": "",
+    "print": "print('hello')\n",
+    "unittest": (
+        "import unittest\n\n"
+        "class T(unittest.TestCase):\n"
+        "    def test_ok(self):\n"
+        "        self.assertTrue(True)\n\n"
+        "unittest.main()\n"
+    ),
+}
+
+
+def benchmark_run_overhead(argv):
+    import subprocess
+    from python_pool import get_pool
+    from functions.run_python_file import run_python_file
+
+    runs = 20
+    args = iter(argv)
+    for arg in args:
+        if arg == "--runs":
+            runs = int(next(args))
+
+    pool = get_pool()
+    if pool is None:
+        print("The warm interpreter pool is disabled or unsupported here (PYTHON_POOL_SIZE = 0?)")
+        return 1
+    pool.warm_up()
+
+    print(f"{'script':<10} {'subprocess.run ms':>18} {'pool ms':>9} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as scratch:
+        for name, source in RUN_OVERHEAD_SCRIPTS.items():
+            script = os.path.join(scratch, f"{name}.py")
+            with open(script, "w") as file:
+                file.write(source)
+
+            # First pool run pays for the worker's own startup; don't count it
+            run_python_file(scratch, script)
+
+            start = time.perf_counter()
+            for _ in range(runs):
+                subprocess.run(["python3", script], cwd=scratch, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=30)
+            cold = (time.perf_counter() - start) / runs * 1000
+
+            start = time.perf_counter()
+            for _ in range(runs):
+                run_python_file(scratch, script)
+            warm = (time.perf_counter() - start) / runs * 1000
+
+            print(f"{name:<10} {cold:>18.1f} {warm:>9.1f} {cold / warm:>7.1f}x")
+    return 0
+
+
+SANDBOX_PATHS = ["main.py", "pkg/calculator.py", "pkg/../tests.py", "."]
+
+
+def benchmark_sandbox(argv):
+    from sandbox import Sandbox, get_sandbox
+
+    runs = 20000
+    args = iter(argv)
+    for arg in args:
+        if arg == "--runs":
+            runs = int(next(args))
+
+    working_directory = WORKING_DIR
+    sandbox = Sandbox(working_directory)
+
+    def abspath_check(path):
+        root = os.path.abspath(working_directory)
+        resolved = os.path.abspath(os.path.join(root, path))
+        return resolved if resolved.startswith(root) else None
+
+    def realpath_check(path):
+        root = os.path.realpath(working_directory)
+        resolved = os.path.realpath(os.path.join(root, path))
+        return resolved if resolved == root or resolved.startswith(root + os.sep) else None
+
+    methods = [
+        ("abspath + startswith", abspath_check),
+        ("realpath, uncached", realpath_check),
+        ("Sandbox.resolve", sandbox.resolve),
+    ]
+
+    def per_call(function, paths):
+        start = time.perf_counter()
+        for _ in range(runs):
+            for path in paths:
+                function(path)
+        return (time.perf_counter() - start) / (runs * len(paths)) * 1e6
+
+    print(f"{'resolve':<30} {'us/call':>8}")
+    for name, function in methods:
+        print(f"{name:<30} {per_call(function, SANDBOX_PATHS):>8.2f}")
+
+    resolved = [sandbox.resolve(path) for path in SANDBOX_PATHS]
+    print("")
+    print(f"{'stat':<30} {'us/call':>8}")
+    print(f"{'os.stat(absolute)':<30} {per_call(os.stat, resolved):>8.2f}")
+    print(f"{'Sandbox.stat (dir fd)':<30} {per_call(sandbox.stat, resolved):>8.2f}")
+
+    def old_tool_path(path):
+        os.stat(abspath_check(path))
+
+    def tool_path(path):
+        # What every tool call does: look up the sandbox, resolve, stat
+        sandbox = get_sandbox(working_directory)
+        sandbox.stat(sandbox.resolve(path))
+
+    print("")
+    print(f"{'per tool call':<30} {'us/call':>8}")
+    print(f"{'abspath check + os.stat':<30} {per_call(old_tool_path, SANDBOX_PATHS):>8.2f}")
+    print(f"{'get_sandbox + resolve + stat':<30} {per_call(tool_path, SANDBOX_PATHS):>8.2f}")
+    return 0
+
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+# Imported only once a session actually starts; seeing them at startup is a regression
+DEFERRED_MODULES = ["google.genai", "dotenv", "asyncio"]
+
+
+def measure_imports(module):
+    """Import module in a fresh interpreter; return (wall ms, {name: (self us, cumulative us)})."""
+    import subprocess
+
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    wall = (time.perf_counter() - start) * 1000
+    times = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            times[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+    return wall, times
+
+
+def benchmark_startup(argv):
+    from statistics import median
+    from config import STARTUP_BUDGET_MS
+
+    runs = 10
+    budget = STARTUP_BUDGET_MS
+    args = iter(argv)
+    for arg in args:
+        if arg == "--runs":
+            runs = int(next(args))
+        elif arg == "--budget":
+            budget = float(next(args))
+
+    walls, totals, self_times = [], [], {}
+    for _ in range(runs):
+        wall, times = measure_imports("main")
+        walls.append(wall)
+        totals.append(times["main"][1] / 1000)
+        for name, (self_us, _) in times.items():
+            self_times.setdefault(name, []).append(self_us / 1000)
+
+    print(f"import main: median {median(totals):.1f} ms (min {min(totals):.1f}, max {max(totals):.1f}) over {runs} runs")
+    print(f"interpreter start + import: median {median(walls):.1f} ms")
+    print("")
+    print(f"{'module':<40} {'self ms':>8}")
+    slowest = sorted(self_times.items(), key=lambda item: median(item[1]), reverse=True)[:10]
+    for name, values in slowest:
+        print(f"{name[:40]:<40} {median(values):>8.2f}")
+
+    early = [name for name in DEFERRED_MODULES if name in self_times]
+    if early:
+        print(f"\nimported at startup but should be deferred: {', '.join(early)}")
+    within = median(totals) <= budget and not early
+    print(f"\n{'OK' if within else 'OVER BUDGET'}: budget {budget:g} ms")
+    return 0 if within else 1
+
+
+def benchmark_metrics(argv):
+    import json
+
+    if not argv:
+        print_usage()
+        return 1
+    records = []
+    for path in argv:
+        with open(path) as file:
+            records += [json.loads(line) for line in file if line.strip()]
+    if not records:
+        print("No sessions recorded")
+        return 1
+
+    wall = sum(record["wall_time"] for record in records)
+    finished = sum(1 for record in records if record.get("finished"))
+    print(
+        f"{len(records)} sessions ({finished} finished), {wall:.2f}s wall in total, "
+        f"{sum(r['prompt_tokens'] for r in records)} prompt and {sum(r['response_tokens'] for r in records)} response tokens"
+    )
+
+    spans = {}
+    for record in records:
+        for key, totals in record.get("spans", {}).items():
+            merged = spans.setdefault(key, {"count": 0, "seconds": 0.0, "result_bytes": 0})
+            for field in merged:
+                merged[field] += totals.get(field, 0)
+
+    print("")
+    print(f"{'span':<32} {'count':>7} {'total s':>9} {'mean ms':>9} {'of wall':>8} {'result KB':>10}")
+    for key, totals in sorted(spans.items(), key=lambda item: item[1]["seconds"], reverse=True):
+        if key == "agent/session":
+            continue
+        print(
+            f"{key[:32]:<32} {totals['count']:>7} {totals['seconds']:>9.3f} "
+            f"{totals['seconds'] / totals['count'] * 1000:>9.1f} "
+            f"{totals['seconds'] / wall if wall else 0:>8.0%} {totals['result_bytes'] / 1024:>10.1f}"
+        )
+    return 0
+
+
+# Text written at the start and end of the sparse log file; the middle is a hole
+LOG_TEXT_BYTES = 4 * 1024 * 1024
+BASELINE_VERSION = 1
+
+
+def build_fixtures(directory, scale):
+    """Write the suite's synthetic working directory for one BENCHMARK_SCALES entry."""
+    many = os.path.join(directory, "many")
+    os.makedirs(many)
+    for i in range(scale["entries"]):
+        with open(os.path.join(many, f"file{i:07d}.txt"), "w") as file:
+            file.write(str(i))
+
+    line = "2024-01-01T00:00:00 INFO worker handled request in 12 ms\n"
+    text = line * (LOG_TEXT_BYTES // len(line))
+    with open(os.path.join(directory, "big.log"), "w") as file:
+        file.write(text)
+        # Sparse, so a multi-GB file costs no disk space or time to make
+        file.seek(scale["file_bytes"] - len(text))
+        file.write(text)
+
+    with open(os.path.join(directory, "noisy.py"), "w") as file:
+        file.write(
+            "import sys\n"
+            f"for i in range({scale['noisy_lines']}):\n"
+            "    print(f'step {i}: ok')\n"
+            "    if i % 10 == 0:\n"
+            "        print(f'warning: step {i} was slow', file=sys.stderr)\n"
+        )
+    with open(os.path.join(directory, "empty.py"), "w") as file:
+        file.write("")
+    with open(os.path.join(directory, "small.py"), "w") as file:
+        file.write("print('hello')\n")
+
+
+def expression_stream(count):
+    """count expressions, mostly distinct, like a long input file fed to the calculator."""
+    import random
+
+    rng = random.Random(0)
+    operators = "+-*/"
+    return [
+        f"{rng.randint(1, 99)} {rng.choice(operators)} {rng.randint(1, 99)} {rng.choice(operators)} "
+        f"( x {rng.choice(operators)} {rng.randint(1, 9)} )"
+        for _ in range(count)
+    ]
+
+
+def suite_benchmarks(directory, scale):
+    """(metric, function, calls per timing) for everything the suite measures."""
+    from google.genai import types
+    from call_function import call_function
+    from functions.get_file_content import get_file_content
+    from functions.get_files_info import get_files_info
+    from functions.run_python_file import run_python_file
+    from functions.write_file import write_file
+
+    sys.path.insert(0, os.path.abspath(WORKING_DIR))
+    from pkg.calculator import Calculator
+
+    size = scale["file_bytes"]
+    content_1mb = "x" * 79 + "\n"
+    content_1mb *= 1024 * 1024 // len(content_1mb)
+    expressions = expression_stream(scale["expressions"])
+    column = list(range(scale["expressions"]))
+    cached_read = types.FunctionCall(name="get_file_content", args={"file_path": "small.py"})
+
+    def evaluate_stream():
+        # A fresh calculator, so every run compiles the stream again
+        calculator = Calculator()
+        for expression in expressions:
+            calculator.evaluate(expression, {"x": 0.5})
+
+    def dispatch():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return call_function(cached_read, working_directory=directory)
+
+    return [
+        ("get_files_info.flat", lambda: get_files_info(directory, "many"), 1),
+        ("get_files_info.recursive", lambda: get_files_info(directory, recursive=True, sort="size"), 1),
+        ("get_file_content.head", lambda: get_file_content(directory, "big.log"), 100),
+        ("get_file_content.offset_tail", lambda: get_file_content(directory, "big.log", offset=size - 100_000), 100),
+        ("get_file_content.lines", lambda: get_file_content(directory, "big.log", start_line=50_000, end_line=50_100), 100),
+        ("write_file.small", lambda: write_file(directory, "out/small.txt", "hello\n"), 100),
+        ("write_file.1mb", lambda: write_file(directory, "out/big.txt", content_1mb), 10),
+        ("run_python_file.empty", lambda: run_python_file(directory, "empty.py"), 5),
+        ("run_python_file.noisy", lambda: run_python_file(directory, "noisy.py", timeout=300), 1),
+        ("call_function.cached_read", dispatch, 1000),
+        ("calculator.evaluate_stream", evaluate_stream, 1),
+        ("calculator.evaluate_batch", lambda: Calculator().evaluate_batch("x * 2 + 3", {"x": column}), 1),
+    ]
+
+
+def time_calls(function, runs, number):
+    """Milliseconds per call of function, once per run, each timing number calls."""
+    result = function()
+    # A benchmark of an error path would measure the wrong thing
+    if isinstance(result, str) and result.startswith("Error"):
+        raise RuntimeError(result)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        times.append((time.perf_counter() - start) / number * 1000)
+    return times
+
+
+def run_suite(scale_name, runs, only=None):
+    """Build the fixtures for a scale, time every benchmark and return the baseline dict."""
+    import platform
+    from statistics import median
+    from config import BENCHMARK_SCALES
+    from python_pool import get_pool
+
+    scale = BENCHMARK_SCALES[scale_name]
+    pool = get_pool()
+    if pool is not None:
+        pool.warm_up()
+
+    metrics = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        start = time.perf_counter()
+        build_fixtures(scratch, scale)
+        print(f"fixtures ({scale_name}): {scale} built in {time.perf_counter() - start:.1f}s")
+        print("")
+        print(f"{'metric':<32} {'median ms':>10} {'min ms':>10} {'runs':>5}")
+        for name, function, number in suite_benchmarks(scratch, scale):
+            if only and not any(name.startswith(prefix) for prefix in only):
+                continue
+            times = time_calls(function, runs, number)
+            metrics[name] = {"median_ms": median(times), "min_ms": min(times), "runs": runs}
+            print(f"{name:<32} {median(times):>10.3f} {min(times):>10.3f} {runs:>5}")
+
+    return {
+        "version": BASELINE_VERSION,
+        "scale": scale_name,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "metrics": metrics,
+    }
+
+
+def parse_suite_args(argv):
+    from config import BENCHMARK_SCALES, BENCHMARK_THRESHOLD
+
+    options = {"scale": "small", "runs": 5, "only": None, "save": None, "threshold": BENCHMARK_THRESHOLD}
+    paths = []
+    args = iter(argv)
+    for arg in args:
+        if arg == "--scale":
+            options["scale"] = next(args, None)
+            if options["scale"] not in BENCHMARK_SCALES:
+                raise ValueError(f"--scale must be one of {', '.join(BENCHMARK_SCALES)}")
+        elif arg == "--runs":
+            options["runs"] = int(next(args))
+        elif arg == "--only":
+            options["only"] = next(args).split(",")
+        elif arg == "--save":
+            options["save"] = next(args)
+        elif arg == "--threshold":
+            options["threshold"] = float(next(args)) / 100
+        else:
+            paths.append(arg)
+    return options, paths
+
+
+def save_baseline(path, baseline):
+    import json
+    from functions.write_file import write_atomic
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    write_atomic(path, json.dumps(baseline, indent=2) + "\n")
+    print(f"\nbaseline saved to {path}")
+
+
+def benchmark_suite(argv):
+    try:
+        options, paths = parse_suite_args(argv)
+    except (ValueError, StopIteration) as e:
+        print(f"Error: {e}" if str(e) else "Error: missing value")
+        return 1
+    if paths:
+        print_usage()
+        return 1
+    baseline = run_suite(options["scale"], options["runs"], options["only"])
+    if options["save"]:
+        save_baseline(options["save"], baseline)
+    return 0
+
+
+def compare_metrics(baseline, current, threshold):
+    """Lines comparing two suite results, and the metrics more than threshold slower."""
+    lines = [f"{'metric':<32} {'baseline ms':>12} {'current ms':>12} {'change':>8}"]
+    regressions = []
+    for name in sorted(set(baseline["metrics"]) | set(current["metrics"])):
+        before = baseline["metrics"].get(name)
+        after = current["metrics"].get(name)
+        if before is None or after is None:
+            lines.append(f"{name:<32} {'new' if before is None else 'not measured':>34}")
+            continue
+        change = after["median_ms"] / before["median_ms"] - 1 if before["median_ms"] else 0.0
+        slower = change > threshold
+        if slower:
+            regressions.append(name)
+        lines.append(
+            f"{name:<32} {before['median_ms']:>12.3f} {after['median_ms']:>12.3f} {change:>+8.0%}"
+            + ("  REGRESSION" if slower else "")
+        )
+    return lines, regressions
+
+
+def benchmark_compare(argv):
+    import json
+
+    try:
+        options, paths = parse_suite_args(argv)
+    except (ValueError, StopIteration) as e:
+        print(f"Error: {e}" if str(e) else "Error: missing value")
+        return 1
+    if len(paths) not in (1, 2):
+        print_usage()
+        return 1
+
+    results = []
+    for path in paths:
+        with open(path) as file:
+            results.append(json.load(file))
+    baseline = results[0]
+    if baseline.get("version") != BASELINE_VERSION:
+        print(f"Error: {paths[0]} is not a baseline written by this version of benchmark.py")
+        return 1
+    if len(results) == 2:
+        current = results[1]
+    else:
+        # Measure now, at the baseline's scale and only what it measured
+        current = run_suite(baseline["scale"], options["runs"], list(baseline["metrics"]))
+        print("")
+        if options["save"]:
+            save_baseline(options["save"], current)
+    if current.get("scale") != baseline.get("scale"):
+        print(f"Error: comparing a {current.get('scale')} run against a {baseline.get('scale')} baseline")
+        return 1
+
+    lines, regressions = compare_metrics(baseline, current, options["threshold"])
+    print("\n".join(lines))
+    print("")
+    if regressions:
+        print(f"FAILED: {len(regressions)} metrics more than {options['threshold']:.0%} slower: {', '.join(regressions)}")
+        return 1
+    print(f"OK: no metric more than {options['threshold']:.0%} slower than the baseline")
+    return 0
+
+
+COMMANDS = {
+    "sessions": benchmark_sessions,
+    "run-overhead": benchmark_run_overhead,
+    "sandbox": benchmark_sandbox,
+    "startup": benchmark_startup,
+    "metrics": benchmark_metrics,
+    "suite": benchmark_suite,
+    "compare": benchmark_compare,
+}
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in COMMANDS:
+        print_usage()
+        sys.exit(1)
+    sys.exit(COMMANDS[sys.argv[1]](sys.argv[2:]))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,135 @@
 import sys
+import time
+from itertools import islice
 from pkg.calculator import Calculator
-from pkg.render import render
+from pkg.render import format_result, render
+
+# Lines handed to a worker at a time with --jobs, and written to stdout at once
+BULK_CHUNK_LINES = 2048
+
+_calculator = None
+
+
+def print_usage():
+    print("Calculator App")
+    print('Usage: python main.py "<expression>"')
+    print('       python main.py --bulk [FILE] [--render] [--jobs N]')
+    print('Example: python main.py "3 + 5"')
+    print("")
+    print("--bulk evaluates one expression per line of FILE (default: stdin) and")
+    print("prints one result per line, or a box per expression with --render.")
+    print("--jobs N spreads the work over N processes; output stays in input order.")
+
+
+def evaluate_lines(lines, show_boxes=False):
+    """Evaluate a chunk of input lines and return the output for all of them as one string."""
+    global _calculator
+    if _calculator is None:
+        _calculator = Calculator()
+    output = []
+    for line in lines:
+        expression = line.strip()
+        if not expression:
+            # Keep output lines aligned with input lines
+            output.append("")
+            continue
+        try:
+            result = _calculator.evaluate(expression)
+            output.append(render(expression, result) if show_boxes else format_result(result))
+        except Exception as e:
+            output.append(f"Error: {e}")
+    return "\n".join(output) + "\n" if output else ""
+
+
+def _evaluate_chunk(show_boxes, lines):
+    return len(lines), evaluate_lines(lines, show_boxes)
+
+
+def _chunks(lines):
+    while True:
+        chunk = list(islice(lines, BULK_CHUNK_LINES))
+        if not chunk:
+            return
+        yield chunk
+
+
+def run_bulk(source, show_boxes=False, jobs=1):
+    """Stream expressions from a file object to stdout. Returns the number of lines."""
+    count = 0
+    chunks = _chunks(source)
+    write = sys.stdout.write
+    if jobs > 1:
+        import multiprocessing
+        from collections import deque
+
+        with multiprocessing.Pool(jobs) as pool:
+            # A bounded window of chunks in flight, collected in input order, so input
+            # is only read as fast as output is written (imap would queue it all)
+            pending = deque()
+            for chunk in chunks:
+                pending.append(pool.apply_async(_evaluate_chunk, (show_boxes, chunk)))
+                if len(pending) >= 2 * jobs:
+                    lines, chunk_output = pending.popleft().get()
+                    write(chunk_output)
+                    count += lines
+            while pending:
+                lines, chunk_output = pending.popleft().get()
+                write(chunk_output)
+                count += lines
+    else:
+        for chunk in chunks:
+            write(evaluate_lines(chunk, show_boxes))
+            count += len(chunk)
+    sys.stdout.flush()
+    return count
 
 
 def main():
-    calculator = Calculator()
-    expression = "3 + 7 * 2"
-    #result = calculator.evaluate(expression)
-    #print(f"Result of '{expression}' is: {result}")
-    #return
-
-    #if len(sys.argv) <= 1:
-    #    print("Calculator App")
-    #    print('Usage: python main.py "<expression>"')
-    #    print('Example: python main.py "3 + 5"')
-    #    return
-
-    #expression = " ".join(sys.argv[1:])
-    try:
-        result = calculator.evaluate(expression)
-        to_print = render(expression, result)
-        print(to_print)
-    except Exception as e:
-        print(f"Error: {e}")
+    args = sys.argv[1:]
+    if not args:
+        print_usage()
+        return
+
+    if args[0] != "--bulk":
+        calculator = Calculator()
+        expression = " ".join(args)
+        try:
+            result = calculator.evaluate(expression)
+            to_print = render(expression, result)
+            print(to_print)
+        except Exception as e:
+            print(f"Error: {e}")
+        return
+
+    path = None
+    show_boxes = False
+    jobs = 1
+    options = iter(args[1:])
+    for arg in options:
+        if arg == "--render":
+            show_boxes = True
+        elif arg == "--jobs":
+            value = next(options, None)
+            if value is None or not value.isdigit() or int(value) < 1:
+                print("Error: --jobs expects a positive integer.", file=sys.stderr)
+                sys.exit(1)
+            jobs = int(value)
+        elif path is None:
+            path = arg
+        else:
+            print_usage()
+            sys.exit(1)
+
+    start = time.perf_counter()
+    if path is None or path == "-":
+        count = run_bulk(sys.stdin, show_boxes, jobs)
+    else:
+        with open(path) as source:
+            count = run_bulk(source, show_boxes, jobs)
+    elapsed = time.perf_counter() - start
+    # On stderr, so stdout holds nothing but results
+    print(f"Evaluated {count} lines in {elapsed:.2f}s ({count / elapsed if elapsed else 0:,.0f} lines/s)", file=sys.stderr)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,12 +1,74 @@
 # calculator.py
 
+import math
+import operator
+import re
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Numbers (3, 3.5, .5, 1e3), variable names, or any other single non-space character
+TOKEN_PATTERN = re.compile(r"(\d+\.?\d*(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)|([A-Za-z_]\w*|\S)")
+# Unary minus in postfix programs, to tell it apart from subtraction
+NEGATE = "u-"
+NEGATE_PRECEDENCE = 3
+# Rows evaluate_batch works on at a time, which bounds its temporary arrays
+BATCH_CHUNK_SIZE = 65536
+
+
+def tokenize(expression):
+    """Split an expression into numbers (as floats), variable names and operator/parenthesis strings."""
+    return [float(number) if number else symbol for number, symbol in TOKEN_PATTERN.findall(expression)]
+
+
+def _nan_divide(a, b):
+    return a / b if b else math.nan
+
+
+def _array_divide(a, b):
+    a, b = np.broadcast_arrays(np.asarray(a, dtype=float), np.asarray(b, dtype=float))
+    result = np.full(a.shape, np.nan)
+    np.divide(a, b, out=result, where=b != 0)
+    return result
+
+
+# Operators for evaluate_batch, where x / 0 is nan instead of an error
+if np is not None:
+    BATCH_OPERATORS = {"+": np.add, "-": np.subtract, "*": np.multiply, "/": _array_divide}
+else:
+    BATCH_OPERATORS = {"+": operator.add, "-": operator.sub, "*": operator.mul, "/": _nan_divide}
+
+
+def _is_column(value):
+    # Scalars, including numpy's 0-d arrays and scalar types, apply to every row
+    return getattr(value, "ndim", None) != 0 and hasattr(value, "__len__") and not isinstance(value, str)
+
+
+class Program:
+    """An expression compiled once: its postfix form, the variables it uses and a
+    function computing its value from a dict of them. batch_run is the same
+    program built on the batch operators, made on first use by evaluate_batch.
+    """
+
+    __slots__ = ("postfix", "names", "run", "batch_run")
+
+    def __init__(self, postfix, names, run):
+        self.postfix = postfix
+        self.names = names
+        self.run = run
+        self.batch_run = None
+
+
 class Calculator:
-    def __init__(self):
+    def __init__(self, cache_size=1024):
         self.operators = {
-            "+": lambda a, b: a + b,
-            "-": lambda a, b: a - b,
-            "*": lambda a, b: a * b,
-            "/": lambda a, b: a / b,
+            "+": operator.add,
+            "-": operator.sub,
+            "*": operator.mul,
+            "/": operator.truediv,
         }
         self.precedence = {
             "+": 1,
@@ -14,48 +76,161 @@ class Calculator:
             "*": 2,
             "/": 2,
         }
+        # Compiled programs, keyed by the expression text
+        self.compile = lru_cache(maxsize=cache_size)(self._compile)
 
-    def evaluate(self, expression):
+    def evaluate(self, expression, variables=None):
         if not expression or expression.isspace():
             return None
-        tokens = expression.strip().split()
-        return self._evaluate_infix(tokens)
+        program = self.compile(expression)
+        if program.names:
+            self._check_names(program, variables)
+        return program.run(variables)
+
+    def evaluate_batch(self, expression, variables=None, chunk_size=BATCH_CHUNK_SIZE, out=None):
+        """Evaluate expression for every row of the named columns in variables.
+
+        Columns are equal-length sequences or arrays; scalars apply to every row.
+        With NumPy the compiled program runs as array operations over chunk_size
+        rows at a time, so temporaries stay small and the columns (and out) can be
+        np.memmap files bigger than memory. Without NumPy it runs row by row.
+        Division by zero gives nan rather than raising. Returns out, or a new
+        float array (a list without NumPy).
+        """
+        variables = variables or {}
+        program = self.compile(expression)
+        self._check_names(program, variables)
+        if program.batch_run is None:
+            program.batch_run = self._build(program.postfix, BATCH_OPERATORS)
+        run = program.batch_run
+
+        values = {name: variables[name] for name in program.names}
+        columns = [name for name, value in values.items() if _is_column(value)]
+        lengths = {len(values[name]) for name in columns}
+        if len(lengths) > 1:
+            raise ValueError("variables must all have the same length")
+        length = lengths.pop() if lengths else 1
+
+        env = {name: float(value) for name, value in values.items() if name not in columns}
+        if np is None:
+            result = out if out is not None else [0.0] * length
+            for i in range(length):
+                for name in columns:
+                    env[name] = float(values[name][i])
+                result[i] = run(env)
+            return result
+
+        result = out if out is not None else np.empty(length)
+        with np.errstate(over="ignore", invalid="ignore"):
+            for start in range(0, length, chunk_size):
+                stop = min(start + chunk_size, length)
+                for name in columns:
+                    env[name] = np.asarray(values[name][start:stop], dtype=float)
+                result[start:stop] = run(env)
+        return result
 
-    def _evaluate_infix(self, tokens):
-        values = []
-        operators = []
+    def _check_names(self, program, variables):
+        for name in program.names:
+            if not variables or name not in variables:
+                raise ValueError(f"unknown variable: {name}")
+
+    def _compile(self, expression):
+        postfix = self._to_postfix(tokenize(expression))
+        names = tuple(dict.fromkeys(item for item in postfix if isinstance(item, str) and item.isidentifier()))
+        return Program(tuple(postfix), names, self._build(postfix, self.operators))
+
+    def _to_postfix(self, tokens):
+        """Shunting-yard: infix tokens to a postfix list, checking the syntax on the way."""
+        precedence = dict(self.precedence, **{NEGATE: NEGATE_PRECEDENCE})
+        output = []
+        pending = []
+        expect_operand = True
+        last_operator = None
 
         for token in tokens:
-            if token in self.operators:
-                while (
-                    operators
-                    and operators[-1] in self.operators
-                    and self.precedence[operators[-1]] >= self.precedence[token]
-                ):
-                    self._apply_operator(operators, values)
-                operators.append(token)
+            if token.__class__ is float or token.isidentifier():
+                if not expect_operand:
+                    raise ValueError("invalid expression")
+                output.append(token)
+                expect_operand = False
+            elif token == "(":
+                if not expect_operand:
+                    raise ValueError("invalid expression")
+                pending.append(token)
+            elif token == ")":
+                if expect_operand:
+                    raise ValueError("invalid expression")
+                while pending and pending[-1] != "(":
+                    output.append(pending.pop())
+                if not pending:
+                    raise ValueError("mismatched parentheses")
+                pending.pop()
+            elif token in self.operators:
+                if expect_operand:
+                    if token != "-":
+                        raise ValueError(f"not enough operands for operator {token}")
+                    pending.append(NEGATE)
+                    continue
+                while pending and pending[-1] != "(" and precedence[pending[-1]] >= precedence[token]:
+                    output.append(pending.pop())
+                pending.append(token)
+                expect_operand = True
+                last_operator = token
             else:
-                try:
-                    values.append(float(token))
-                except ValueError:
-                    raise ValueError(f"invalid token: {token}")
+                raise ValueError(f"invalid token: {token}")
+
+        if expect_operand:
+            if last_operator is None and not pending:
+                raise ValueError("invalid expression")
+            raise ValueError(f"not enough operands for operator {last_operator or '-'}")
+        while pending:
+            token = pending.pop()
+            if token == "(":
+                raise ValueError("mismatched parentheses")
+            output.append(token)
+        return output
+
+    def _build(self, postfix, operators):
+        """Turn a postfix list into nested closures over a dict of variables,
+        folding constant subexpressions.
+
+        A node is either a float (already folded) or a function computing its value.
+        Divisions by zero are left unfolded so they raise ZeroDivisionError every
+        time the program runs.
+        """
+        nodes = []
+        for item in postfix:
+            if item.__class__ is float:
+                nodes.append(item)
+            elif item == NEGATE:
+                value = nodes.pop()
+                nodes.append(-value if value.__class__ is float else _negate(value))
+            elif item in operators:
+                right = nodes.pop()
+                nodes[-1] = _binary(operators[item], nodes[-1], right)
+            else:
+                nodes.append(_load(item))
+
+        value = nodes.pop()
+        return (lambda env: value) if value.__class__ is float else value
 
-        while operators:
-            self._apply_operator(operators, values)
 
-        if len(values) != 1:
-            raise ValueError("invalid expression")
+def _load(name):
+    return lambda env: env[name]
 
-        return values[0]
 
-    def _apply_operator(self, operators, values):
-        if not operators:
-            return
+def _negate(function):
+    return lambda env: -function(env)
 
-        operator = operators.pop()
-        if len(values) < 2:
-            raise ValueError(f"not enough operands for operator {operator}")
 
-        b = values.pop()
-        a = values.pop()
-        values.append(self.operators[operator](a, b))
\ No newline at end of file
+def _binary(function, a, b):
+    if a.__class__ is float:
+        if b.__class__ is float:
+            try:
+                return float(function(a, b))
+            except ZeroDivisionError:
+                return lambda env: function(a, b)
+        return lambda env: function(a, b(env))
+    if b.__class__ is float:
+        return lambda env: function(a(env), b)
+    return lambda env: function(a(env), b(env))
@@ -1,22 +1,23 @@
-
-def render(expression, result):
+def format_result(result):
     if isinstance(result, float) and result.is_integer():
-        result_str = str(int(result))
-    else:
-        result_str = str(result)
+        return str(int(result))
+    return str(result)
+
 
+def render(expression, result):
+    result_str = format_result(result)
     box_width = max(len(expression), len(result_str)) + 4
+    width = box_width - 2
 
-    box = []
-    box.append("┌" + "─" * box_width + "┐")
-    box.append(
-        "│" + " " * 2 + expression + " " * (box_width - len(expression) - 2) + "│"
-    )
-    box.append("│" + " " * box_width + "│")
-    box.append("│" + " " * 2 + "=" + " " * (box_width - 3) + "│")
-    box.append("│" + " " * box_width + "│")
-    box.append(
-        "│" + " " * 2 + result_str + " " * (box_width - len(result_str) - 2) + "│"
+    # One format call per box; bulk mode renders a lot of them
+    border = "─" * box_width
+    blank = " " * box_width
+    return (
+        f"┌{border}┐\n"
+        f"│  {expression:<{width}}│\n"
+        f"│{blank}│\n"
+        f"│  {'=':<{width}}│\n"
+        f"│{blank}│\n"
+        f"│  {result_str:<{width}}│\n"
+        f"└{border}┘"
     )
-    box.append("└" + "─" * box_width + "┘")
-    return "\n".join(box)
\ No newline at end of file
@@ -1,5 +1,10 @@
 
+import math
+import sys
+import time
 import unittest
+from unittest import mock
+from pkg import calculator as calculator_module
 from pkg.calculator import Calculator
 
 
@@ -43,6 +48,109 @@ class TestCalculator(unittest.TestCase):
         with self.assertRaises(ValueError):
             self.calculator.evaluate("+ 3")
 
+    def test_unspaced_expression(self):
+        result = self.calculator.evaluate("3+7*2")
+        self.assertEqual(result, 17)
+
+    def test_parentheses(self):
+        result = self.calculator.evaluate("(3 + 7) * (2 - 4)")
+        self.assertEqual(result, -20)
+
+    def test_unary_minus(self):
+        result = self.calculator.evaluate("2 * -(1 + 2)")
+        self.assertEqual(result, -6)
+
+    def test_mismatched_parentheses(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("(3 + 5")
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("3 + 5)")
+
+    def test_division_by_zero(self):
+        with self.assertRaises(ZeroDivisionError):
+            self.calculator.evaluate("1 / (2 - 2)")
+
+    def test_compiled_once(self):
+        program = self.calculator.compile("3 + 7 * 2")
+        self.assertIs(self.calculator.compile("3 + 7 * 2"), program)
+        self.assertEqual(program.postfix, (3.0, 7.0, 2.0, "*", "+"))
+
+    def test_variables(self):
+        result = self.calculator.evaluate("a * b + 3", {"a": 2, "b": 5})
+        self.assertEqual(result, 13)
+
+    def test_unknown_variable(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate("a + 1")
+
+
+class TestEvaluateBatch(unittest.TestCase):
+    def setUp(self):
+        self.calculator = Calculator()
+
+    @unittest.skipIf(calculator_module.np is None, "NumPy is not installed")
+    def test_numpy_columns(self):
+        np = calculator_module.np
+        a = np.arange(10.0)
+        result = self.calculator.evaluate_batch("a * b + 3", {"a": a, "b": 2})
+        self.assertEqual(result.tolist(), [x * 2 + 3 for x in range(10)])
+
+    @unittest.skipIf(calculator_module.np is None, "NumPy is not installed")
+    def test_numpy_chunks_and_division_by_zero(self):
+        np = calculator_module.np
+        a = np.arange(10.0)
+        b = np.array([0, 1, 2, 0, 4, 5, 0, 7, 8, 9.0])
+        result = self.calculator.evaluate_batch("a / b", {"a": a, "b": b}, chunk_size=3)
+        self.assertTrue(np.isnan(result[[0, 3, 6]]).all())
+        self.assertEqual(result[[1, 2, 4]].tolist(), [1, 1, 1])
+
+    def test_pure_python_fallback(self):
+        operators = {"+": calculator_module.operator.add, "-": calculator_module.operator.sub,
+                     "*": calculator_module.operator.mul, "/": calculator_module._nan_divide}
+        with mock.patch.multiple(calculator_module, np=None, BATCH_OPERATORS=operators):
+            result = Calculator().evaluate_batch("a / b + k", {"a": [0, 1, 2, 3], "b": [0, 1, 2, 0], "k": 1})
+        self.assertTrue(math.isnan(result[0]) and math.isnan(result[3]))
+        self.assertEqual(result[1:3], [2, 2])
+
+    def test_mismatched_lengths(self):
+        with self.assertRaises(ValueError):
+            self.calculator.evaluate_batch("a + b", {"a": [1, 2], "b": [1, 2, 3]})
+
+
+
+class BenchmarkCalculator(unittest.TestCase):
+    """Throughput of evaluate(); run with -v to see the numbers."""
+
+    def report(self, name, count, seconds):
+        if "-v" in sys.argv or "--verbose" in sys.argv:
+            print(f"\n  {name}: {count / seconds:,.0f} evaluations/s", end=" ", flush=True)
+
+    def test_repeated_expression_throughput(self):
+        calculator = Calculator()
+        count = 50000
+        start = time.perf_counter()
+        for _ in range(count):
+            calculator.evaluate("2 * 3 - 8 / 2 + 5")
+        self.report("repeated expression", count, time.perf_counter() - start)
+
+    def test_unique_expression_throughput(self):
+        calculator = Calculator()
+        expressions = [f"({i} + 7) * {i % 13} - {i} / 4" for i in range(5000)]
+        start = time.perf_counter()
+        for expression in expressions:
+            calculator.evaluate(expression)
+        self.report("unique expressions", len(expressions), time.perf_counter() - start)
+
+    def test_batch_throughput(self):
+        calculator = Calculator()
+        count = 200000
+        a = [float(i) for i in range(count)]
+        if calculator_module.np is not None:
+            a = calculator_module.np.asarray(a)
+        start = time.perf_counter()
+        calculator.evaluate_batch("(a * b + 3) / (a - b)", {"a": a, "b": 0.5})
+        self.report("evaluate_batch", count, time.perf_counter() - start)
+
 
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
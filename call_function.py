@@ -1,20 +1,20 @@
-from functions.get_files_info import get_files_info
-from functions.get_file_content import get_file_content
-from functions.run_python_file import run_python_file
-from functions.write_file import write_file
-from google.genai import types
 import json
 from config import WORKING_DIR,MAX_ITERATIONS
+from tool_cache import tool_cache, INVALIDATING_FUNCTIONS, WRITE_FUNCTIONS
+from code_index import notify_write
+from condense import condense
+from prefetch import prefetcher
+import affected_tests
+import sandbox
+from tool_registry import tool_functions
+import tracing
 
+# Built once; the registry derives each tool's declaration when it is imported
+function_map = tool_functions()
 
 
-def call_function(function_call_part, verbose=False):
-    function_map = {
-        "get_files_info": get_files_info,
-        "get_file_content": get_file_content,
-        "run_python_file": run_python_file,
-        "write_file": write_file
-    }
+def call_function(function_call_part, verbose=False, working_directory=WORKING_DIR):
+    from google.genai import types
 
     function_name = function_call_part.name
     args = function_call_part.args
@@ -38,8 +38,13 @@ def call_function(function_call_part, verbose=False):
                 ]
             )
 
-    # Add working_directory manually
-    args["working_directory"] = WORKING_DIR
+    # Add working_directory manually, to a copy: the call's own args stay in the
+    # message history, which goes back to the model and into recordings and checkpoints
+    args = dict(args)
+    args["working_directory"] = working_directory
+    if function_name == "run_python_file":
+        # Show script output as it happens in verbose mode
+        args["echo"] = verbose
 
     if function_name not in function_map:
         return types.Content(
@@ -53,7 +58,47 @@ def call_function(function_call_part, verbose=False):
         )
 
     try:
-        result = function_map[function_name](**args)
+        args_bytes = len(json.dumps(args, default=str))
+        with tracing.span("call_function", "tools", tool=function_name, args_bytes=args_bytes) as trace_args:
+            # Serve repeated reads of unchanged paths from the cache
+            cache_key = tool_cache.key(function_name, args)
+            result = tool_cache.get(cache_key) if cache_key else None
+            if result is not None:
+                trace_args["cache"] = "hit"
+                if verbose:
+                    print(f"   (served {function_name} from cache)")
+            else:
+                # A file the last listing turned up may already have been read in the background
+                if cache_key and function_name == "get_file_content":
+                    result = prefetcher.get(cache_key)
+                if result is not None:
+                    trace_args["cache"] = "prefetch"
+                    if verbose:
+                        print(f"   (served {function_name} from prefetch)")
+                else:
+                    trace_args["cache"] = "miss" if cache_key else "none"
+                    with tracing.span(function_name, "tool") as body_args:
+                        result = function_map[function_name](**args)
+                        body_args["result_bytes"] = len(result.encode())
+                if cache_key and not result.startswith("Error"):
+                    tool_cache.put(cache_key, result)
+            if function_name == "get_files_info":
+                prefetcher.schedule(working_directory, args.get("directory"), result)
+            # Cached results stay whole; what goes into the prompt is condensed every time
+            raw_bytes = len(result.encode())
+            result = condense(function_name, result)
+            trace_args["result_bytes"] = len(result.encode())
+            trace_args["condensed_bytes"] = raw_bytes - trace_args["result_bytes"]
+            trace_args["error"] = result.startswith("Error")
+        if function_name in INVALIDATING_FUNCTIONS:
+            tool_cache.invalidate()
+            prefetcher.invalidate()
+            sandbox.invalidate()
+            # A written file is re-indexed on the next search; a script could have written anything
+            written = args.get("file_path") if function_name in WRITE_FUNCTIONS else None
+            notify_write(working_directory, written)
+            # ...and the tests that import it run again
+            affected_tests.notify_write(working_directory, written)
     except Exception as e:
         return types.Content(
             role="tool",
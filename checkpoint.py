@@ -0,0 +1,112 @@
+import json
+import os
+import secrets
+import time
+
+from config import CHECKPOINT_DIR
+from model_backend import dump_contents, load_contents
+
+CHECKPOINT_VERSION = 1
+
+
+class SessionCheckpoint:
+    """Append-only record of one agent session, for picking it up again later.
+
+    The file is JSONL: a header with the prompt and working directory, then one
+    line per finished iteration holding only the messages that iteration added
+    and the stats so far. Saving costs one small append per iteration, and a run
+    killed mid-write leaves at most a torn last line, which load() cuts off.
+    """
+
+    def __init__(self, path, header, messages=None, stats=None):
+        self.path = path
+        self.header = header
+        # Restored on load; empty for a new session
+        self.messages = messages or []
+        self.stats = stats or {}
+        self.saved = len(self.messages)
+
+    @property
+    def session_id(self):
+        return self.header["id"]
+
+    @property
+    def prompt(self):
+        return self.header["prompt"]
+
+    @property
+    def working_directory(self):
+        return self.header["working_directory"]
+
+    @property
+    def iterations(self):
+        return self.stats.get("iterations", 0)
+
+    @property
+    def finished(self):
+        return self.stats.get("finished", False)
+
+    @classmethod
+    def create(cls, prompt, working_directory, directory=CHECKPOINT_DIR):
+        session_id = time.strftime("%Y%m%d-%H%M%S-") + secrets.token_hex(3)
+        header = {
+            "version": CHECKPOINT_VERSION,
+            "id": session_id,
+            "prompt": prompt,
+            "working_directory": working_directory,
+        }
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{session_id}.jsonl")
+        with open(path, "w") as file:
+            file.write(json.dumps(header) + "\n")
+        return cls(path, header)
+
+    @classmethod
+    def load(cls, session, directory=CHECKPOINT_DIR):
+        """Load a checkpoint by session id or by path."""
+        path = session if os.path.exists(session) else os.path.join(directory, f"{session}.jsonl")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f'No saved session "{session}" (looked for {path})')
+        header, messages, stats = None, [], {}
+        intact = 0
+        with open(path, "rb") as file:
+            for line in file:
+                try:
+                    # Without its newline the line was cut short, even if it happens to parse
+                    entry = json.loads(line) if line.endswith(b"\n") else None
+                except ValueError:
+                    entry = None
+                if entry is None:
+                    # A torn write from a run that was killed; everything before it is intact
+                    break
+                intact += len(line)
+                if header is None:
+                    header = entry
+                    continue
+                messages += entry["messages"]
+                stats = entry["stats"]
+        if not header or header.get("version") != CHECKPOINT_VERSION:
+            raise ValueError(f"{path} is not a session checkpoint this version can resume")
+        if intact < os.path.getsize(path):
+            # Cut the torn line off, or the next save would be appended onto it and lost too
+            with open(path, "r+b") as file:
+                file.truncate(intact)
+        return cls(path, header, load_contents(messages), stats)
+
+    def save(self, messages, stats):
+        """Append the messages added since the last save, with the stats so far."""
+        entry = {
+            "messages": dump_contents(messages[self.saved:]),
+            "stats": {key: value for key, value in stats.as_dict().items()},
+        }
+        with open(self.path, "a") as file:
+            file.write(json.dumps(entry) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        self.saved = len(messages)
+        self.stats = entry["stats"]
+
+    def restore_stats(self, stats):
+        for key, value in self.stats.items():
+            setattr(stats, key, value)
+        return stats
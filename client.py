@@ -0,0 +1,47 @@
+import json
+import os
+import socket
+import sys
+
+from config import DAEMON_SOCKET
+
+
+def main():
+    """Run a prompt on the agent daemon (daemon.py). Takes the same arguments as main.py,
+    plus --socket PATH, and prints the session's output as it streams in.
+    """
+    argv = []
+    socket_path = DAEMON_SOCKET
+    args = iter(sys.argv[1:])
+    for arg in args:
+        if arg == "--socket":
+            socket_path = next(args, socket_path)
+        else:
+            argv.append(arg)
+
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+    except OSError as e:
+        print(f"Error: no agent daemon on {socket_path} ({e}); start one with python daemon.py", file=sys.stderr)
+        sys.exit(1)
+
+    exit_code = 1
+    with connection, connection.makefile("r", encoding="utf-8") as events:
+        connection.sendall((json.dumps({"argv": argv, "cwd": os.getcwd()}) + "\n").encode())
+        try:
+            for line in events:
+                event = json.loads(line)
+                if event["event"] == "output":
+                    sys.stdout.write(event["text"])
+                    sys.stdout.flush()
+                elif event["event"] == "done":
+                    exit_code = event["exit_code"]
+        except KeyboardInterrupt:
+            # Closing the connection stops the session; it can be resumed from its checkpoint
+            exit_code = 130
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
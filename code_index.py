@@ -0,0 +1,304 @@
+import atexit
+import hashlib
+import os
+import pickle
+import re
+import threading
+import time
+
+try:
+    import re._parser as sre_parse
+    from re._constants import BRANCH, LITERAL, SUBPATTERN
+except ImportError:  # Python < 3.11
+    import sre_parse
+    from sre_constants import BRANCH, LITERAL, SUBPATTERN
+
+from config import (
+    SEARCH_INDEX_DIR,
+    SEARCH_INDEX_REFRESH_SECONDS,
+    SEARCH_MAX_FILE_BYTES,
+)
+
+INDEX_VERSION = 1
+SKIP_DIRS = {".git", "__pycache__", ".venv", "venv", "node_modules", ".mypy_cache", ".pytest_cache"}
+
+
+def trigrams(text):
+    """Lowercased trigrams of text; queries of any case narrow down to the same files."""
+    text = text.lower()
+    return set(map("".join, zip(text, text[1:], text[2:])))
+
+
+def _flatten(parsed):
+    """Inline plain groups, which match exactly once, into the surrounding sequence."""
+    for op, av in parsed:
+        if op is SUBPATTERN and not any(sub_op is BRANCH for sub_op, _ in av[-1]):
+            yield from _flatten(av[-1])
+        else:
+            yield op, av
+
+
+def _literal_runs(parsed):
+    """Literal strings every match of a parsed regex sequence must contain."""
+    runs, current = [], []
+    for op, av in _flatten(parsed):
+        if op is LITERAL:
+            current.append(chr(av))
+        else:
+            runs.append("".join(current))
+            current = []
+    runs.append("".join(current))
+    return [run for run in runs if len(run) >= 3]
+
+
+def query_plan(pattern, regex=True, flags=0):
+    """Return alternatives (lists of required literals), or None if the index can't narrow it down."""
+    if not regex:
+        return [[pattern]] if len(pattern) >= 3 else None
+    try:
+        parsed = list(sre_parse.parse(pattern, flags))
+    except re.error:
+        return None
+    if len(parsed) == 1 and parsed[0][0] is BRANCH:
+        alternatives = [_literal_runs(list(branch)) for branch in parsed[0][1][1]]
+    else:
+        alternatives = [_literal_runs(parsed)]
+    if not all(alternatives):
+        return None
+    return alternatives
+
+
+class TrigramIndex:
+    """On-disk trigram index of the text files under one directory.
+
+    Each indexed file version gets an id; postings map a trigram to the ids of the
+    files containing it. When a file changes it gets a new id and the old one is
+    dropped from `files`, so stale postings are simply ignored until they pile up
+    enough to be worth compacting.
+    """
+
+    def __init__(self, root, index_dir=SEARCH_INDEX_DIR):
+        self.root = os.path.realpath(root)
+        digest = hashlib.sha1(self.root.encode()).hexdigest()[:16]
+        self.path = os.path.join(index_dir, f"trigrams-{digest}.pickle")
+        self.lock = threading.Lock()
+        self.files = {}  # rel_path -> (mtime_ns, size, file_id)
+        self.paths = {}  # file_id -> rel_path
+        self.postings = {}  # trigram -> set of file ids
+        self.next_id = 0
+        self.dead_ids = 0
+        self.dirty = set()
+        self.last_scan = None
+        self.loaded = False
+        self.unsaved = False
+
+    def _load(self):
+        self.loaded = True
+        try:
+            with open(self.path, "rb") as file:
+                data = pickle.load(file)
+        except (OSError, pickle.PickleError, EOFError, AttributeError):
+            return
+        if data.get("version") != INDEX_VERSION or data.get("root") != self.root:
+            return
+        self.files = data["files"]
+        self.postings = data["postings"]
+        self.next_id = data["next_id"]
+        self.dead_ids = data["dead_ids"]
+        self.paths = {file_id: path for path, (_, _, file_id) in self.files.items()}
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as file:
+            pickle.dump(
+                {
+                    "version": INDEX_VERSION,
+                    "root": self.root,
+                    "files": self.files,
+                    "postings": self.postings,
+                    "next_id": self.next_id,
+                    "dead_ids": self.dead_ids,
+                },
+                file,
+                protocol=pickle.HIGHEST_PROTOCOL,
+            )
+        os.replace(temp_path, self.path)
+        self.unsaved = False
+
+    def _walk(self, directory, rel_dir=""):
+        with os.scandir(directory) as it:
+            for entry in it:
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name not in SKIP_DIRS:
+                            yield from self._walk(entry.path, rel_path)
+                    elif entry.is_file(follow_symlinks=False):
+                        yield rel_path, entry.stat()
+                except OSError:
+                    continue
+
+    def _forget(self, rel_path):
+        entry = self.files.pop(rel_path, None)
+        if entry:
+            del self.paths[entry[2]]
+            self.dead_ids += 1
+
+    def _index_file(self, rel_path, stat=None):
+        """(Re)index one file. Returns True if the index changed."""
+        full_path = os.path.join(self.root, rel_path)
+        try:
+            stat = stat or os.stat(full_path)
+        except OSError:
+            stat = None
+        old = self.files.get(rel_path)
+        if stat and old and old[:2] == (stat.st_mtime_ns, stat.st_size):
+            return False
+        data = None
+        if stat is not None and stat.st_size <= SEARCH_MAX_FILE_BYTES:
+            try:
+                with open(full_path, "rb") as file:
+                    data = file.read()
+            except OSError:
+                pass
+        if data is None or b"\0" in data[:8192]:
+            # Gone, too big or binary
+            self._forget(rel_path)
+            return old is not None
+        text = data.decode("utf-8", errors="replace")
+
+        self._forget(rel_path)
+        file_id = self.next_id
+        self.next_id += 1
+        self.files[rel_path] = (stat.st_mtime_ns, stat.st_size, file_id)
+        self.paths[file_id] = rel_path
+        postings = self.postings
+        for trigram in trigrams(text):
+            ids = postings.get(trigram)
+            if ids is None:
+                postings[trigram] = {file_id}
+            else:
+                ids.add(file_id)
+        return True
+
+    def _compact(self):
+        live = set(self.paths)
+        for trigram in list(self.postings):
+            ids = self.postings[trigram]
+            ids &= live
+            if not ids:
+                del self.postings[trigram]
+        self.dead_ids = 0
+
+    def mark_dirty(self, rel_path=None):
+        """Note a write. A path is re-indexed on the next query; None rescans the whole tree."""
+        with self.lock:
+            if rel_path is None:
+                self.last_scan = None
+            else:
+                self.dirty.add(os.path.normpath(rel_path).replace(os.sep, "/"))
+
+    def refresh(self):
+        """Bring the index up to date: dirty paths always, the whole tree every so often.
+
+        Re-indexing a few written files is cheap, so those changes are only saved
+        to disk at exit; a full rescan that found changes is saved right away.
+        """
+        if not self.loaded:
+            self._load()
+        for rel_path in self.dirty:
+            self.unsaved |= self._index_file(rel_path)
+        self.dirty.clear()
+
+        if self.last_scan is None or time.monotonic() - self.last_scan >= SEARCH_INDEX_REFRESH_SECONDS:
+            changed = False
+            seen = set()
+            for rel_path, stat in self._walk(self.root):
+                seen.add(rel_path)
+                changed |= self._index_file(rel_path, stat)
+            for rel_path in set(self.files) - seen:
+                self._forget(rel_path)
+                changed = True
+            if self.dead_ids > len(self.files):
+                self._compact()
+            self.last_scan = time.monotonic()
+            if changed:
+                self._save()
+
+    def save_if_needed(self):
+        with self.lock:
+            if self.unsaved:
+                self._save()
+
+    def candidates(self, plan):
+        """Paths that may match a query plan from query_plan()."""
+        if plan is None:
+            return sorted(self.files)
+        ids = set()
+        for literals in plan:
+            alternative = None
+            for literal in literals:
+                for trigram in trigrams(literal):
+                    posting = self.postings.get(trigram, set())
+                    alternative = set(posting) if alternative is None else alternative & posting
+                    if not alternative:
+                        break
+            ids |= alternative or set()
+        return sorted(self.paths[file_id] for file_id in ids if file_id in self.paths)
+
+    def search(self, pattern, regex=False, case_sensitive=True, max_results=50, context_lines=0, path_filter=None):
+        """Return (matches, files_scanned); matches are (rel_path, line_no, [(line_no, text), ...])."""
+        flags = 0 if case_sensitive else re.IGNORECASE
+        compiled = re.compile(pattern if regex else re.escape(pattern), flags)
+        with self.lock:
+            self.refresh()
+            paths = self.candidates(query_plan(pattern, regex, flags))
+
+        matches = []
+        for rel_path in paths:
+            if path_filter and not path_filter(rel_path):
+                continue
+            try:
+                with open(os.path.join(self.root, rel_path), encoding="utf-8", errors="replace") as file:
+                    lines = file.read().splitlines()
+            except OSError:
+                continue
+            for i, line in enumerate(lines):
+                if compiled.search(line):
+                    first = max(0, i - context_lines)
+                    window = [(n + 1, lines[n]) for n in range(first, min(len(lines), i + context_lines + 1))]
+                    matches.append((rel_path, i + 1, window))
+                    if len(matches) >= max_results:
+                        return matches, len(paths)
+        return matches, len(paths)
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+@atexit.register
+def _save_indexes():
+    for index in list(_indexes.values()):
+        try:
+            index.save_if_needed()
+        except OSError:
+            pass
+
+
+def get_index(working_directory):
+    root = os.path.realpath(working_directory)
+    with _indexes_lock:
+        if root not in _indexes:
+            _indexes[root] = TrigramIndex(root)
+        return _indexes[root]
+
+
+def notify_write(working_directory, rel_path=None):
+    """Tell the index for working_directory that a tool wrote rel_path (None: anything)."""
+    root = os.path.realpath(working_directory)
+    with _indexes_lock:
+        index = _indexes.get(root)
+    if index:
+        index.mark_dirty(rel_path)
@@ -0,0 +1,129 @@
+import re
+import threading
+
+from config import CONDENSE_BUDGETS
+
+# Shortest run of a repeated line or block of lines that is collapsed
+MIN_REPEATS = 3
+# Longest block of lines looked for as a repeating unit, e.g. a cycle of
+# traceback frames in mutual recursion (two lines per frame)
+MAX_BLOCK_LINES = 8
+# Passing test lines, from unittest -v ("test_x (mod.Test.test_x) ... ok")
+# and pytest -v ("test_mod.py::test_x PASSED [ 50%]")
+PASSED_TEST = re.compile(r"^\S.* \.\.\. ok$|^\S+::\S+ PASSED(?: +\[ *\d+%\])?$")
+
+
+def strip_trailing_whitespace(lines):
+    return [line.rstrip() for line in lines]
+
+
+def collapse_repeats(lines, min_repeats=MIN_REPEATS):
+    """Replace a line or block of lines repeated back to back with one copy and a note."""
+    result = []
+    i = 0
+    while i < len(lines):
+        best_size, best_count = 1, 1
+        for size in range(1, MAX_BLOCK_LINES + 1):
+            block = lines[i:i + size]
+            if len(block) < size:
+                break
+            count = 1
+            while lines[i + count * size:i + (count + 1) * size] == block:
+                count += 1
+            # Prefer whichever collapses the most lines
+            if count >= min_repeats and count * size > best_count * best_size:
+                best_size, best_count = size, count
+        if best_count < min_repeats:
+            result.append(lines[i])
+            i += 1
+            continue
+        result += lines[i:i + best_size]
+        what = "line" if best_size == 1 else f"{best_size} lines"
+        result.append(f"[... previous {what} repeated {best_count - 1} more times ...]")
+        i += best_size * best_count
+    return result
+
+
+def summarize_passed_tests(lines):
+    """Replace runs of passing tests with a count. Failures, errors and skips stay as they are."""
+    result = []
+    passed = 0
+    for line in lines:
+        if PASSED_TEST.match(line):
+            passed += 1
+            continue
+        if passed:
+            result.append(f"[{passed} passing tests]")
+            passed = 0
+        result.append(line)
+    if passed:
+        result.append(f"[{passed} passing tests]")
+    return result
+
+
+def fit_budget(text, budget):
+    """Keep the start and end of text within budget characters, noting what was cut."""
+    if not budget or len(text) <= budget:
+        return text
+    half = budget // 2
+    omitted = len(text) - 2 * half
+    return f"{text[:half]}\n[... {omitted} characters condensed away ...]\n{text[-half:]}"
+
+
+# What each tool's results go through. Only command and test output is condensed:
+# the model copies file text (get_file_content, search_code) into edit_file, which
+# matches it byte for byte, so those results stay exact.
+CONDENSERS = {
+    "run_python_file": [strip_trailing_whitespace, summarize_passed_tests, collapse_repeats],
+    "run_tests": [strip_trailing_whitespace, collapse_repeats],
+}
+
+
+class CondenseStats:
+    """Characters of tool output before and after condensing, per tool."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.tools = {}
+
+    def add(self, function_name, before, after):
+        with self.lock:
+            totals = self.tools.setdefault(function_name, {"calls": 0, "before": 0, "after": 0})
+            totals["calls"] += 1
+            totals["before"] += before
+            totals["after"] += after
+
+    def format_stats(self, chars_per_token):
+        with self.lock:
+            tools = {name: dict(totals) for name, totals in self.tools.items()}
+        saved = sum(totals["before"] - totals["after"] for totals in tools.values())
+        lines = [f"Condensed tool results: ~{saved // chars_per_token} tokens saved"]
+        for name, totals in sorted(tools.items()):
+            if totals["before"] > totals["after"]:
+                lines.append(
+                    f"  {name}: {totals['calls']} results, {totals['before']} -> {totals['after']} chars "
+                    f"({1 - totals['after'] / totals['before']:.0%} smaller)"
+                )
+        return "\n".join(lines)
+
+
+condense_stats = CondenseStats()
+
+
+def condense(function_name, result, budgets=CONDENSE_BUDGETS):
+    """Shrink a tool result before it goes into the prompt, by the steps listed for its tool
+    and then to its budget in CONDENSE_BUDGETS. Results of other tools pass through as they are.
+    """
+    steps = CONDENSERS.get(function_name)
+    budget = budgets.get(function_name)
+    if not steps and not budget:
+        return result
+    condensed = result
+    if steps:
+        lines = result.split("\n")
+        for step in steps:
+            lines = step(lines)
+        condensed = "\n".join(lines)
+    condensed = fit_budget(condensed, budget)
+    condense_stats.add(function_name, len(result), len(condensed))
+    return condensed
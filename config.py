@@ -1,3 +1,92 @@
 MAX_CHARS = 10000
 MAX_ITERATIONS = 15
-WORKING_DIR = "./calculator"
\ No newline at end of file
+WORKING_DIR = "./calculator"
+MAX_TOOL_WORKERS = 4
+
+# Gemini free tier quotas for gemini-2.0-flash
+REQUESTS_PER_MINUTE = 15
+TOKENS_PER_MINUTE = 1000000
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+MODEL_NAME = "gemini-2.0-flash-001"
+
+# Sessions a --batch run keeps going at once (they share the rate limits above)
+BATCH_CONCURRENCY = 4
+
+# Where sessions are checkpointed after every iteration, for --resume
+CHECKPOINT_DIR = "./.agent_cache/sessions"
+
+# daemon.py: the Unix socket it serves sessions on (client.py connects to it) and how
+# many sessions it runs at once
+DAEMON_SOCKET = "./.agent_cache/agent.sock"
+DAEMON_MAX_SESSIONS = 4
+
+# Estimated prompt tokens the messages history may use before old tool results are collapsed
+CONTEXT_TOKEN_BUDGET = 32000
+
+# Most characters a tool's result may take in the prompt once condensed (condense.py);
+# tools not listed are only condensed, never cut
+CONDENSE_BUDGETS = {
+    "run_python_file": 6000,
+    "run_tests": 6000,
+}
+
+# Resolved paths each working directory's sandbox remembers between writes, and how
+# many working directories keep a sandbox (each holds an open directory fd)
+SANDBOX_CACHE_SIZE = 4096
+SANDBOX_MAX_DIRECTORIES = 16
+
+# Total size of the read-only tool results kept for reuse
+TOOL_CACHE_MAX_BYTES = 8 * 1024 * 1024
+
+# Files read ahead after a get_files_info listing, while the model thinks (0 turns it off):
+# how many per listing, the largest file worth it, which kinds, the total kept unread,
+# and how many threads read them
+PREFETCH_MAX_FILES = 8
+PREFETCH_MAX_FILE_BYTES = 64 * 1024
+PREFETCH_EXTENSIONS = {".py", ".md", ".txt", ".rst", ".toml", ".cfg", ".ini", ".json", ".yaml", ".yml"}
+PREFETCH_MAX_BYTES = 1024 * 1024
+PREFETCH_WORKERS = 2
+
+# Most entries get_files_info returns per call; the rest is reachable with its cursor
+MAX_LISTING_ENTRIES = 1000
+
+# search_code trigram index: where it lives, how often the whole tree is re-checked
+# for outside changes, and the largest file it indexes
+SEARCH_INDEX_DIR = "./.agent_cache"
+SEARCH_INDEX_REFRESH_SECONDS = 30.0
+SEARCH_MAX_FILE_BYTES = 2 * 1024 * 1024
+SEARCH_MAX_RESULTS = 50
+
+# run_python_file: default and longest allowed timeout, CPU/memory limits for the
+# script (None for no limit; the CPU limit grows to a longer timeout), how much of the start and end of each output stream
+# is kept, and the warm interpreter pool (0 to always start a fresh interpreter)
+# with the modules its workers import up front
+RUN_TIMEOUT_SECONDS = 30
+RUN_MAX_TIMEOUT_SECONDS = 300
+RUN_CPU_LIMIT_SECONDS = 60
+RUN_MEMORY_LIMIT_BYTES = None
+RUN_OUTPUT_HEAD_BYTES = 4000
+RUN_OUTPUT_TAIL_BYTES = 4000
+PYTHON_POOL_SIZE = 2
+PYTHON_POOL_PRELOAD = ["unittest", "json", "re", "collections", "dataclasses", "typing", "argparse", "pathlib", "decimal"]
+
+# run_tests: which files hold tests, how many worker processes run them at once
+# (those that find every warm interpreter busy start a fresh one), and where their
+# results are kept between runs
+RUN_TESTS_PATTERN = "test*.py"
+RUN_TESTS_WORKERS = 4
+RUN_TESTS_CACHE_DIR = "./.agent_cache"
+
+# Most milliseconds `import main` may take (python benchmark.py startup checks it)
+STARTUP_BUDGET_MS = 150
+
+# benchmark.py suite: fixture sizes per --scale (entries in one directory, bytes of
+# the sparse log file, lines a noisy script prints, expressions in the calculator
+# stream), and how much slower than its baseline a metric may get before compare fails
+BENCHMARK_SCALES = {
+    "small": {"entries": 10_000, "file_bytes": 2 * 1024**3, "noisy_lines": 100_000, "expressions": 20_000},
+    "large": {"entries": 1_000_000, "file_bytes": 8 * 1024**3, "noisy_lines": 1_000_000, "expressions": 1_000_000},
+}
+BENCHMARK_THRESHOLD = 0.25
@@ -0,0 +1,173 @@
+import json
+import os
+
+from config import CONTEXT_TOKEN_BUDGET
+from dispatch import PATH_ARGS
+from tool_cache import WRITE_FUNCTIONS
+
+# Rough Gemini tokenizer ratio for English and code
+CHARS_PER_TOKEN = 4
+# Role, part and framing overhead per part
+PART_OVERHEAD_TOKENS = 4
+STUB_PREFIX = "[elided"
+# Results smaller than this cost about as much as their stub, so they're left alone
+MIN_COLLAPSE_TOKENS = 64
+
+def _parts(item):
+    parts = getattr(item, "parts", None)
+    return parts if parts is not None else [item]
+
+
+def estimate_part_tokens(part):
+    chars = len(part.text or "")
+    if part.function_call:
+        chars += len(part.function_call.name or "") + len(json.dumps(part.function_call.args or {}, default=str))
+    if part.function_response:
+        chars += len(part.function_response.name or "") + len(json.dumps(part.function_response.response or {}, default=str))
+    return chars // CHARS_PER_TOKEN + PART_OVERHEAD_TOKENS
+
+
+def estimate_tokens(item):
+    """Estimate the prompt tokens one messages entry (Content or Part) costs."""
+    return sum(estimate_part_tokens(part) for part in _parts(item))
+
+
+def _call_path(name, args):
+    path = (args or {}).get(PATH_ARGS.get(name, ""), None) or "."
+    return os.path.normpath(path)
+
+
+def _is_under(path, directory):
+    return directory == "." or path == directory or path.startswith(directory + os.sep)
+
+
+class ToolResult:
+    """A function response in messages, paired with the call that produced it."""
+
+    def __init__(self, index, part_index, part, args):
+        self.index = index
+        self.part_index = part_index
+        self.part = part
+        self.name = part.function_response.name
+        self.args = args or {}
+        self.path = _call_path(self.name, self.args)
+
+    @property
+    def is_stub(self):
+        result = (self.part.function_response.response or {}).get("result")
+        return isinstance(result, str) and result.startswith(STUB_PREFIX)
+
+
+def pair_tool_results(messages):
+    """Return a ToolResult for every function response, matched to its function call's args."""
+    pending = []
+    results = []
+    for index, item in enumerate(messages):
+        for part_index, part in enumerate(_parts(item)):
+            if part.function_call:
+                pending.append(part.function_call)
+            elif part.function_response:
+                args = None
+                for i, call in enumerate(pending):
+                    if call.name == part.function_response.name:
+                        args = pending.pop(i).args
+                        break
+                results.append(ToolResult(index, part_index, part, args))
+    return results
+
+
+def _superseded_by(result, later):
+    """True if a later call makes this tool result out of date."""
+    if later.name == result.name and later.args == result.args:
+        return True
+    if later.name in WRITE_FUNCTIONS:
+        if result.name == "get_file_content":
+            return later.path == result.path
+        if result.name == "get_files_info":
+            return _is_under(later.path, result.path)
+    return False
+
+
+class ContextWindowManager:
+    """Keeps the messages history sent on every generate_content call under a token budget.
+
+    Tool results that a later call made stale (a file read followed by a write to
+    that file, a listing or test run repeated later) are always collapsed into
+    short stubs. If the history is still over budget, the oldest remaining tool
+    results are collapsed too. The prompt, the model's latest turn and the tool
+    results answering it are never touched.
+    """
+
+    def __init__(self, token_budget=CONTEXT_TOKEN_BUDGET, verbose=False):
+        self.token_budget = token_budget
+        self.verbose = verbose
+        self.tokens_saved = 0
+        self.compactions = 0
+
+    def total_tokens(self, messages):
+        return sum(estimate_tokens(item) for item in messages)
+
+    def _protected_from(self, messages):
+        """Index of the first entry that must be kept intact (the model's latest turn)."""
+        for index in range(len(messages) - 1, -1, -1):
+            if getattr(messages[index], "role", None) == "model":
+                return index
+        return len(messages)
+
+    def _collapse(self, messages, result, reason):
+        from google.genai import types
+
+        before = estimate_part_tokens(result.part)
+        stub = types.Part.from_function_response(
+            name=result.name,
+            response={"result": f"{STUB_PREFIX} {reason}: {result.name}({json.dumps(result.args, default=str)}) "
+                                f"returned ~{before} tokens; call it again if you need it]"},
+        )
+        item = messages[result.index]
+        if getattr(item, "parts", None) is None:
+            messages[result.index] = stub
+        else:
+            item.parts[result.part_index] = stub
+        return before - estimate_part_tokens(stub)
+
+    def compact(self, messages):
+        """Collapse stale and old tool results in place. Returns the tokens saved."""
+        protected_from = self._protected_from(messages)
+        results = pair_tool_results(messages)
+        candidates = [
+            position
+            for position, result in enumerate(results)
+            if result.index < protected_from
+            and not result.is_stub
+            and estimate_part_tokens(result.part) >= MIN_COLLAPSE_TOKENS
+        ]
+        saved = 0
+        collapsed = set()
+
+        for position in candidates:
+            result = results[position]
+            if any(_superseded_by(result, later) for later in results[position + 1:]):
+                saved += self._collapse(messages, result, "stale")
+                collapsed.add(position)
+
+        if self.token_budget:
+            total = self.total_tokens(messages)
+            for position in candidates:
+                if total <= self.token_budget:
+                    break
+                if position in collapsed:
+                    continue
+                freed = self._collapse(messages, results[position], "old")
+                total -= freed
+                saved += freed
+                collapsed.add(position)
+
+        if collapsed:
+            self.compactions += 1
+            self.tokens_saved += saved
+            if self.verbose:
+                print(
+                    f"[context] collapsed {len(collapsed)} tool result(s), saved ~{saved} tokens "
+                    f"(history now ~{self.total_tokens(messages)} tokens, budget {self.token_budget})"
+                )
+        return saved
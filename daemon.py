@@ -0,0 +1,268 @@
+import asyncio
+import contextvars
+import json
+import os
+import socket
+import sys
+
+from config import DAEMON_MAX_SESSIONS, DAEMON_SOCKET
+
+# Options whose value is a path, made absolute against the client's directory
+PATH_OPTIONS = {"--record", "--replay"}
+# Options that apply to the whole process; the daemon takes them itself
+DAEMON_ONLY_OPTIONS = {"--batch", "--trace", "--metrics", "--prefetch"}
+
+# Where the current session's events go; follows it into its tool threads like tracing's session
+_emit = contextvars.ContextVar("daemon_emit", default=None)
+
+
+def print_usage():
+    print("Usage: python daemon.py [--socket PATH] [--max-sessions N] [--trace PATH] [--metrics PATH] [--prefetch N]")
+    print("")
+    print("Serves agent sessions on a Unix socket from one warm process. Run prompts")
+    print("through it with client.py, which takes the same arguments as main.py.")
+
+
+class SessionOutput:
+    """Stands in for sys.stdout: what a session prints goes to its client, anything else to the real stdout."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        emit = _emit.get()
+        if emit is None:
+            return self.stream.write(text)
+        emit({"event": "output", "text": text})
+        return len(text)
+
+    def flush(self):
+        if _emit.get() is None:
+            self.stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+def client_argv(argv, cwd):
+    """The client's argv with path options made absolute against the client's working directory."""
+    result = []
+    args = iter(argv)
+    for arg in args:
+        result.append(arg)
+        if arg in PATH_OPTIONS or arg == "--resume":
+            value = next(args, None)
+            if value is None:
+                break
+            path = os.path.join(cwd, value)
+            # --resume takes a session id as well as a checkpoint path
+            result.append(path if arg in PATH_OPTIONS or os.path.exists(path) else value)
+    return result
+
+
+class AgentDaemon:
+    """Runs agent sessions for clients of a Unix socket, in one long-lived process.
+
+    The SDK import, the tool declarations, the Gemini client and rate limiter,
+    the warm interpreter pool and the tool, search and path caches are set up
+    once and shared by every session. Up to max_sessions sessions run at once on
+    one event loop, each with its own messages and stats.
+
+    A client sends one JSON line, {"argv": [...main.py arguments], "cwd": ...},
+    and gets JSON lines back: {"event": "output", "text"} for everything the
+    session prints, {"event": "model" | "tools", "iteration"} as it goes, and
+    finally {"event": "done", "exit_code", "stats"}. Closing the connection
+    stops the session; its checkpoint keeps what was done.
+
+    make_gemini_backend() returns the backend for sessions that don't --replay;
+    pass a fake one to run the daemon without the live model.
+    """
+
+    def __init__(self, socket_path=DAEMON_SOCKET, max_sessions=DAEMON_MAX_SESSIONS, make_gemini_backend=None):
+        self.socket_path = socket_path
+        self.max_sessions = max_sessions
+        self.make_gemini_backend = make_gemini_backend or self._gemini_backend
+        self.gemini = None
+        self.semaphore = None
+
+    def _gemini_backend(self):
+        if self.gemini is None:
+            from model_backend import GeminiBackend
+
+            # One client and scheduler for every session, so they share the rate limits
+            self.gemini = GeminiBackend(api_key=os.environ.get("GEMINI_API_KEY"))
+        return self.gemini
+
+    def warm_up(self):
+        """Pay once for what every main.py run pays for at startup."""
+        from dotenv import load_dotenv
+        from python_pool import get_pool
+        from tool_registry import build_tool
+
+        load_dotenv()
+        build_tool()
+        if self.make_gemini_backend == self._gemini_backend and os.environ.get("GEMINI_API_KEY"):
+            self._gemini_backend()
+        pool = get_pool()
+        if pool is not None:
+            pool.warm_up()
+
+    async def serve(self):
+        self.semaphore = asyncio.Semaphore(self.max_sessions)
+        directory = os.path.dirname(self.socket_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.socket_path):
+            # A leftover from a daemon that died, unless one still answers on it
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                try:
+                    probe.connect(self.socket_path)
+                except OSError:
+                    os.unlink(self.socket_path)
+                else:
+                    raise RuntimeError(f"another daemon is already listening on {self.socket_path}")
+        # Sessions can read and write the working directory; only this user may start them.
+        # Connections are refused until listen(), which start_unix_server calls after the chmod.
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            listener.bind(self.socket_path)
+            os.chmod(self.socket_path, 0o600)
+            server = await asyncio.start_unix_server(self.handle, sock=listener)
+        except BaseException:
+            listener.close()
+            raise
+        print(f"Agent daemon listening on {self.socket_path} ({self.max_sessions} sessions at once)", file=sys.stderr)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        events = asyncio.Queue()
+
+        def emit(event):
+            # Called from tool threads too
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        try:
+            request = json.loads(await reader.readline() or "null")
+        except ValueError:
+            request = None
+        if not isinstance(request, dict):
+            writer.close()
+            return
+
+        session = asyncio.create_task(self.run_request(request, emit))
+        # The client closing its end (Ctrl-C) stops its session
+        watcher = asyncio.create_task(reader.read())
+
+        def stop(_):
+            session.cancel()
+
+        watcher.add_done_callback(stop)
+        try:
+            while (event := await events.get()) is not None:
+                writer.write((json.dumps(event) + "\n").encode())
+                await writer.drain()
+        except ConnectionError:
+            session.cancel()
+        finally:
+            watcher.remove_done_callback(stop)
+            watcher.cancel()
+            await asyncio.wait([session])
+            writer.close()
+
+    async def run_request(self, request, emit):
+        # Set in this task's own context, so only this session's output is sent to this client
+        _emit.set(emit)
+        exit_code, stats = 1, None
+        try:
+            exit_code, stats = await self.run_argv(request.get("argv") or [], request.get("cwd") or os.getcwd(), emit)
+        except SystemExit as e:
+            # parse_args and open_session exit on bad arguments, as they do in main.py
+            exit_code = e.code if isinstance(e.code, int) else 1
+        except Exception as e:
+            print(f"Error: {type(e).__name__}: {e}")
+        finally:
+            emit({"event": "done", "exit_code": exit_code, "stats": stats})
+            emit(None)
+
+    async def run_argv(self, argv, cwd, emit):
+        from main import open_session, parse_args, print_resume_hint, run_session_async
+
+        argv = client_argv(argv, cwd)
+        for arg in argv:
+            if arg in DAEMON_ONLY_OPTIONS:
+                print(f"Error: {arg} applies to the whole daemon; pass it to daemon.py, or run main.py directly.")
+                return 1, None
+
+        prompt, verbose, options = parse_args(argv)
+        # Like main.py run from the client's directory: its working directory and checkpoints
+        session = open_session(prompt, verbose, options, self.make_gemini_backend, cwd)
+        if session is None:
+            return 0, None
+        prompt, working_directory, checkpoint, backend = session
+
+        def on_step(kind, stats):
+            emit({"event": kind, "iteration": stats.iterations})
+
+        async with self.semaphore:
+            stats = None
+            try:
+                stats = await run_session_async(
+                    backend, prompt, verbose, options, working_directory, checkpoint, on_step
+                )
+            finally:
+                print_resume_hint(checkpoint, stats)
+        return 0, {key: value for key, value in stats.as_dict().items() if key != "final_response"}
+
+
+def main():
+    import tracing
+    from prefetch import prefetcher
+
+    socket_path = DAEMON_SOCKET
+    max_sessions = DAEMON_MAX_SESSIONS
+    trace = metrics = None
+    args = iter(sys.argv[1:])
+    for arg in args:
+        value = next(args, None)
+        if value is None:
+            print_usage()
+            sys.exit(1)
+        if arg == "--socket":
+            socket_path = value
+        elif arg in ["--max-sessions", "--prefetch"] and value.isdigit():
+            if arg == "--max-sessions":
+                max_sessions = max(1, int(value))
+            else:
+                prefetcher.max_files = int(value)
+        elif arg == "--trace":
+            trace = value
+        elif arg == "--metrics":
+            metrics = value
+        else:
+            print_usage()
+            sys.exit(1)
+
+    if trace or metrics:
+        tracing.enable(trace, metrics)
+    daemon = AgentDaemon(socket_path, max_sessions)
+    daemon.warm_up()
+    sys.stdout = SessionOutput(sys.stdout)
+    try:
+        asyncio.run(daemon.serve())
+    except KeyboardInterrupt:
+        pass
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    finally:
+        tracing.finish()
+
+
+if __name__ == "__main__":
+    main()
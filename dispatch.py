@@ -0,0 +1,94 @@
+import contextvars
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from call_function import call_function
+from config import MAX_TOOL_WORKERS, WORKING_DIR
+import tracing
+
+# Tools that only look at the tree. They never conflict with each other.
+READ_ONLY_FUNCTIONS = {"get_files_info", "get_file_content", "search_code"}
+
+# Argument holding the path each tool works on.
+PATH_ARGS = {
+    "get_files_info": "directory",
+    "get_file_content": "file_path",
+    "write_file": "file_path",
+    "edit_file": "file_path",
+    "run_python_file": "file_path",
+    "run_tests": "path",
+}
+
+
+def _footprint(function_call):
+    """Return the relative path a call touches and whether it only reads it."""
+    name = function_call.name
+    args = function_call.args
+    if not isinstance(args, dict):
+        try:
+            args = json.loads(args)
+        except Exception:
+            args = {}
+
+    path = args.get(PATH_ARGS.get(name, ""), None) or "."
+    path = os.path.normpath(path)
+    if os.path.isabs(path) or path == ".." or path.startswith(".." + os.sep):
+        # Let the tool report the error, but don't race anything else meanwhile
+        path = "."
+
+    if name == "run_python_file":
+        # A script can touch anything next to it (tests importing pkg/, etc.)
+        path = os.path.dirname(path) or "."
+    elif name == "run_tests":
+        # Tests import from anywhere in the tree
+        path = "."
+
+    return path, name in READ_ONLY_FUNCTIONS
+
+
+def _overlaps(a, b):
+    if a == "." or b == "." or a == b:
+        return True
+    return a.startswith(b + os.sep) or b.startswith(a + os.sep)
+
+
+def call_functions(
+    function_calls, verbose=False, max_workers=MAX_TOOL_WORKERS, working_directory=WORKING_DIR
+):
+    """Run the function calls of one model turn and return their results in call order.
+
+    Read-only calls run in parallel. A call that writes (or runs a script) waits for
+    every earlier call on an overlapping path, and later calls on that path wait for it.
+    """
+    function_calls = list(function_calls)
+    with tracing.span("dispatch", "tools", calls=len(function_calls), max_workers=max_workers):
+        if max_workers <= 1 or len(function_calls) <= 1:
+            return [call_function(fc, verbose, working_directory) for fc in function_calls]
+        return _call_concurrently(function_calls, verbose, max_workers, working_directory)
+
+
+def _call_concurrently(function_calls, verbose, max_workers, working_directory):
+
+    footprints = [_footprint(fc) for fc in function_calls]
+
+    def run(index, deps):
+        if deps:
+            with tracing.span("wait_for_earlier_calls", "tools", waiting_on=len(deps)):
+                for dep in deps:
+                    dep.result()
+        return call_function(function_calls[index], verbose, working_directory)
+
+    # Tasks are submitted in call order and only ever wait on earlier ones, so a
+    # bounded pool can't deadlock: everything a task waits on was dequeued before it.
+    futures = []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(function_calls))) as pool:
+        for i, (path, read_only) in enumerate(footprints):
+            deps = [
+                futures[j]
+                for j, (other_path, other_read_only) in enumerate(footprints[:i])
+                if not (read_only and other_read_only) and _overlaps(path, other_path)
+            ]
+            # Each task runs in a copy of this context, so its spans land in this session's trace
+            futures.append(pool.submit(contextvars.copy_context().run, run, i, deps))
+        return [future.result() for future in futures]
@@ -0,0 +1,167 @@
+import difflib
+import re
+from typing import Optional, TypedDict
+from functions.write_file import write_atomic
+from sandbox import get_sandbox
+from tool_registry import tool
+
+HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+# Lines of the change summary shown back to the model
+MAX_SUMMARY_LINES = 40
+
+
+class Edit(TypedDict):
+    """One search/replace pair for edit_file.
+
+    Attributes:
+        search: Exact text to find, including enough surrounding lines to be unique.
+        replace: Text to put in its place.
+    """
+
+    search: str
+    replace: str
+
+
+def _parse_unified_diff(diff):
+    """Split a unified diff into hunks of (old_start, old_lines, new_lines). File headers are ignored."""
+    hunks = []
+    old = new = None
+    for line in diff.splitlines():
+        header = HUNK_HEADER.match(line)
+        if header:
+            old, new = [], []
+            hunks.append((int(header.group(1)), old, new))
+            continue
+        if old is None or line.startswith("\\"):
+            # Before the first hunk ("---", "+++", "diff --git"), or "\ No newline at end of file"
+            continue
+        tag, text = line[:1], line[1:]
+        if tag == " " or not line:
+            # Editors and models often strip the space from blank context lines
+            old.append(text)
+            new.append(text)
+        elif tag == "-":
+            old.append(text)
+        elif tag == "+":
+            new.append(text)
+        else:
+            raise ValueError(f"unexpected line in hunk {len(hunks)}: {line!r}")
+    if not hunks:
+        raise ValueError("no hunks found; expected lines starting with '@@ -start,count +start,count @@'")
+    return hunks
+
+
+def _find(keys, old, expected, lowest):
+    """Index where the lines `old` appear, searching outward from the expected one."""
+    last = len(keys) - len(old)
+    expected = max(lowest, min(expected, last))
+    for distance in range(max(expected - lowest, last - expected) + 1):
+        for position in (expected - distance, expected + distance):
+            if lowest <= position <= last and keys[position:position + len(old)] == old:
+                return position
+    return None
+
+
+def _apply_unified_diff(content, diff):
+    lines = content.splitlines(keepends=True)
+    keys = [line.rstrip("\r\n") for line in lines]
+    eol = "\r\n" if lines and lines[0].endswith("\r\n") else "\n"
+
+    hunks = _parse_unified_diff(diff)
+    result = []
+    copied = 0  # lines of the original already copied or replaced
+    offset = 0  # how far earlier hunks moved later lines
+    for number, (start, old, new) in enumerate(hunks, 1):
+        if old:
+            position = _find(keys, old, start - 1 + offset, copied)
+            if position is None:
+                raise ValueError(
+                    f"hunk {number} (@@ -{start}) does not match the file; re-read those lines and try again"
+                )
+        else:
+            # Pure insertion after line `start`
+            position = max(copied, min(start + offset, len(lines)))
+        result += lines[copied:position]
+        result += [text + eol for text in new]
+        copied = position + len(old)
+        offset += len(new) - len(old)
+    result += lines[copied:]
+
+    edited = "".join(result)
+    if content and not content.endswith("\n") and edited.endswith(eol) and copied == len(lines):
+        # Keep a missing final newline missing
+        edited = edited[:-len(eol)]
+    return edited, len(hunks)
+
+
+def _apply_replacements(content, edits):
+    if isinstance(edits, dict):
+        edits = [edits]
+    for number, edit in enumerate(edits, 1):
+        search = edit.get("search") or ""
+        replace = edit.get("replace") or ""
+        if not search:
+            raise ValueError(f"edit {number} has an empty search string")
+        count = content.count(search)
+        if count == 0:
+            raise ValueError(f"edit {number}: search text not found; re-read the file and copy it exactly")
+        if count > 1:
+            raise ValueError(
+                f"edit {number}: search text appears {count} times; include more surrounding lines so it matches once"
+            )
+        content = content.replace(search, replace)
+    return content, len(edits)
+
+
+def _summary(before, after):
+    diff = list(difflib.unified_diff(before.splitlines(), after.splitlines(), n=0, lineterm=""))[2:]
+    added = sum(1 for line in diff if line.startswith("+"))
+    removed = sum(1 for line in diff if line.startswith("-"))
+    if len(diff) > MAX_SUMMARY_LINES:
+        diff = diff[:MAX_SUMMARY_LINES] + [f"[...{len(diff) - MAX_SUMMARY_LINES} more diff lines]"]
+    return added, removed, diff
+
+
+@tool()
+def edit_file(working_directory, file_path: str, diff: Optional[str] = None, edits: Optional[list[Edit]] = None):
+    """Changes part of an existing file without resending all of it, using either a unified diff or exact search/replace pairs. Every hunk must match the current file or nothing is written. Returns a short diff of what changed.
+
+    Args:
+        file_path: Relative path to the file to edit.
+        diff: A unified diff for this file, with '@@ -start,count +start,count @@' hunk headers and a few unchanged context lines around each change.
+        edits: Search/replace pairs applied in order; each search text must appear exactly once in the file.
+    """
+    try:
+        sandbox = get_sandbox(working_directory)
+        resolved_path = sandbox.resolve(file_path)
+        if resolved_path is None:
+            return f'Error: Cannot edit "{file_path}" as it is outside the permitted working directory'
+        file_path = resolved_path
+        if not sandbox.isfile(file_path):
+            return f'Error: File not found or is not a regular file: "{file_path}" (use write_file to create it)'
+        if bool(diff) == bool(edits):
+            return "Error: pass either diff (a unified diff) or edits (a list of search/replace pairs)"
+
+        with sandbox.open(file_path, newline="") as file:
+            content = file.read()
+
+        # Every hunk is checked against the current content before anything is written
+        try:
+            if diff:
+                edited, hunks = _apply_unified_diff(content, diff)
+            else:
+                edited, hunks = _apply_replacements(content, edits)
+        except ValueError as e:
+            return f'Error: {e}. "{file_path}" was not changed.'
+
+        if edited == content:
+            return f'No changes: "{file_path}" already has this content'
+        write_atomic(file_path, edited)
+
+        added, removed, summary = _summary(content, edited)
+        return "\n".join(
+            [f'Successfully edited "{file_path}" ({hunks} hunk(s), +{added} -{removed} lines)'] + summary
+        )
+
+    except Exception as e:
+        return f"Error: {str(e)}"
@@ -1,30 +1,192 @@
-import os
+import threading
+from collections import OrderedDict
+from itertools import accumulate
+from stat import S_ISREG
+from typing import Optional
 from config import MAX_CHARS
-def get_file_content(working_directory, file_path):
-    try:
-        # Resolve absolute paths
-        working_directory = os.path.abspath(working_directory)
-        file_path = os.path.abspath(os.path.join(working_directory, file_path))
+from sandbox import get_sandbox
+from tool_registry import tool
+
+# Every LINE_INDEX_STRIDE-th line start is remembered, so finding any line
+# means one seek plus reading at most that many lines.
+LINE_INDEX_STRIDE = 1024
+SCAN_CHUNK_BYTES = 1024 * 1024
+MAX_LINE_INDEXES = 32
+
+
+def _read_lines(file, pos, size, chunk_size=SCAN_CHUNK_BYTES):
+    """Return the complete lines starting at byte offset pos, reading about chunk_size bytes."""
+    while True:
+        file.seek(pos)
+        chunk = file.read(chunk_size)
+        lines = chunk.splitlines(keepends=True)
+        if pos + len(chunk) >= size:
+            return lines
+        # The last line may go on past the chunk (or be a \r whose \n comes next)
+        lines.pop()
+        if lines:
+            return lines
+        chunk_size *= 2
+
+
+class LineIndex:
+    """Sparse line-start offsets of one file version, extended only as deep as lines are asked for."""
+
+    def __init__(self, signature):
+        self.signature = signature
+        self.checkpoints = []
+        self.scanned_to = 0
+        self.lines_scanned = 0
+        self.complete = False
+        # Reads of the same file run in parallel tool threads; only one extends the index at a time
+        self.lock = threading.Lock()
+
+    def _scan(self, file, size):
+        lines = _read_lines(file, self.scanned_to, size)
+        starts = list(accumulate(map(len, lines), initial=self.scanned_to))
+        first = (-self.lines_scanned) % LINE_INDEX_STRIDE
+        self.checkpoints.extend(starts[first:-1:LINE_INDEX_STRIDE])
+        self.lines_scanned += len(lines)
+        self.scanned_to = starts[-1]
+        if self.scanned_to >= size:
+            self.complete = True
+
+    def offset(self, file, size, line):
+        """Byte offset where 0-based line starts (size if it is one past the last line), or None."""
+        checkpoint, skip = divmod(line, LINE_INDEX_STRIDE)
+        with self.lock:
+            while len(self.checkpoints) <= checkpoint and not self.complete:
+                self._scan(file, size)
+            if checkpoint >= len(self.checkpoints):
+                return size if line == self.lines_scanned else None
+            pos = self.checkpoints[checkpoint]
+
+        # Checkpoints never change once found, so the rest needs no lock
+        while skip:
+            if pos >= size:
+                return None
+            lines = _read_lines(file, pos, size)[:skip]
+            pos += sum(map(len, lines))
+            skip -= len(lines)
+        return pos
+
+
+_line_indexes = OrderedDict()
+_line_indexes_lock = threading.Lock()
+
+
+def _line_index(path, stat):
+    signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    with _line_indexes_lock:
+        index = _line_indexes.get(path)
+        if index is None or index.signature != signature:
+            index = LineIndex(signature)
+            _line_indexes[path] = index
+        _line_indexes.move_to_end(path)
+        while len(_line_indexes) > MAX_LINE_INDEXES:
+            _line_indexes.popitem(last=False)
+        return index
 
-        # Check if the file is within the working directory
-        if not file_path.startswith(working_directory):
+
+def _read_byte_range(sandbox, file_path, size, offset, length):
+    if offset < 0 or (length is not None and length <= 0):
+        return "Error: offset must be >= 0 and length > 0"
+    if offset >= size and size:
+        return f"Error: offset {offset} is past the end of the file ({size} bytes)"
+    length = min(length or MAX_CHARS, MAX_CHARS)
+    with sandbox.open(file_path, 'rb') as file:
+        file.seek(offset)
+        content = file.read(length).decode('utf-8', errors='replace')
+    end = offset + length
+    if offset > 0 or end < size:
+        content += f"\n[...bytes {offset}-{min(end, size)} of {size} shown"
+        content += f"; continue with offset={end}]" if end < size else "]"
+    return content
+
+
+def _read_line_range(sandbox, file_path, stat, start_line, end_line):
+    if start_line < 1 or (end_line is not None and end_line < start_line):
+        return "Error: start_line must be >= 1 and end_line >= start_line"
+    size = stat.st_size
+    index = _line_index(file_path, stat)
+    with sandbox.open(file_path, 'rb') as file:
+        start = index.offset(file, size, start_line - 1)
+        if start is None or (start >= size and size):
+            return f"Error: start_line {start_line} is past the end of the file"
+        end = index.offset(file, size, end_line) if end_line is not None else None
+        if end is None:
+            end = size
+        file.seek(start)
+        data = file.read(min(end - start, MAX_CHARS))
+    content = data.decode('utf-8', errors='replace')
+
+    if start + len(data) < end:
+        # The page is bigger than MAX_CHARS: stop at the last complete line
+        cut = content.rfind("\n") + 1
+        if not cut:
+            return content + f"\n[...line {start_line} truncated; continue with offset={start + len(data)}]"
+        content = content[:cut]
+        last_line = start_line + content.count("\n") - 1
+        content += f"\n[...lines {start_line}-{last_line} shown, truncated at {MAX_CHARS} characters; continue with start_line={last_line + 1}]"
+    elif end < size:
+        content += f"\n[...lines {start_line}-{end_line} shown; continue with start_line={end_line + 1}]"
+    return content
+
+
+@tool()
+def get_file_content(
+    working_directory,
+    file_path: str,
+    offset: Optional[int] = None,
+    length: Optional[int] = None,
+    start_line: Optional[int] = None,
+    end_line: Optional[int] = None,
+):
+    """Reads and returns the content of a file within the working directory, or a range of its lines or bytes.
+
+    Args:
+        file_path: Relative path to the file to be read.
+        offset: Optional byte offset to start reading at, for files without useful line breaks.
+        length: Optional number of bytes to read from offset.
+        start_line: Optional first line to return (1-based). Use with end_line to page through large files.
+        end_line: Optional last line to return (inclusive).
+    """
+    try:
+        # Resolve the path, symlinks included, and check it is within the working directory
+        sandbox = get_sandbox(working_directory)
+        resolved_path = sandbox.resolve(file_path)
+        if resolved_path is None:
             return f'Error: Cannot read "{file_path}" as it is outside the permitted working directory'
+        file_path = resolved_path
 
         # Check if the file exists and is a file
-        if not os.path.isfile(file_path):
+        try:
+            stat = sandbox.stat(file_path)
+        except OSError:
+            stat = None
+        if stat is None or not S_ISREG(stat.st_mode):
             return f"Error: File not found or is not a regular file: {file_path}"
 
+        if (offset is not None or length is not None) and (start_line is not None or end_line is not None):
+            return "Error: Use either offset/length or start_line/end_line, not both"
+
+        # Ranged reads only touch the requested page, however big the file is
+        if offset is not None or length is not None:
+            return _read_byte_range(sandbox, file_path, stat.st_size, int(offset or 0), length and int(length))
+        if start_line is not None or end_line is not None:
+            return _read_line_range(sandbox, file_path, stat, int(start_line or 1), end_line and int(end_line))
+
         # Read and return the file content
-        #truncate the content 
-        with open(file_path, 'r') as file:
-            content = file.read()
-            # print(len(content),"+++")
+        # truncate the content, reading no more than we return
+        with sandbox.open(file_path, 'r') as file:
+            content = file.read(MAX_CHARS + 1)
             if len(content) > MAX_CHARS:
-                truncated_content = content[:MAX_CHARS] + f"\n[...File \"{file_path}\" truncated at 10000 characters]"
+                truncated_content = content[:MAX_CHARS] + (
+                    f"\n[...File \"{file_path}\" truncated at {MAX_CHARS} characters; "
+                    f"read further with start_line/end_line or offset/length]"
+                )
                 return truncated_content
             return content
-        
+
     except Exception as e:
         return f"Error: {str(e)}"
-
-
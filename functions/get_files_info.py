@@ -1,31 +1,191 @@
 import os
+import re
+from fnmatch import translate
+from typing import Literal, Optional
+from config import MAX_LISTING_ENTRIES
+from sandbox import get_sandbox
+from tool_registry import tool
 
-def get_files_info(working_directory, directory=None):
+SORT_KEYS = {
+    "name": lambda entry, stat: entry.name,
+    "size": lambda entry, stat: -stat.st_size,
+    "mtime": lambda entry, stat: -stat.st_mtime,
+}
+
+
+def _patterns(value):
+    """Compile a list of globs (or a comma-separated string of them) into one matcher."""
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    patterns = [translate(pattern.strip()) for pattern in value if pattern.strip()]
+    return re.compile("|".join(patterns)).match if patterns else None
+
+
+def _matches(rel_path, name, match):
+    return match(name) or match(rel_path)
+
+
+def _read_gitignore(directory, rel_dir):
+    """Parse the .gitignore in a directory into (rel_dir, pattern, negate, dir_only, anchored) rules."""
+    rules = []
     try:
-        # Resolve absolute paths
-        working_directory = os.path.abspath(working_directory)
-        if directory:
-            directory = os.path.abspath(os.path.join(working_directory, directory))
-        else:
-            directory = working_directory
+        with open(os.path.join(directory, ".gitignore")) as file:
+            lines = file.read().splitlines()
+    except OSError:
+        return rules
+    for line in lines:
+        line = line.rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        line = line[1:] if negate else line
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        anchored = "/" in line
+        rules.append((rel_dir, re.compile(translate(line.lstrip("/"))).match, negate, dir_only, anchored))
+    return rules
+
+
+def _ignored(rules, rel_path, name, is_dir):
+    ignored = False
+    for rel_dir, match, negate, dir_only, anchored in rules:
+        if dir_only and not is_dir:
+            continue
+        if anchored:
+            prefix = rel_dir + "/" if rel_dir else ""
+            if not rel_path.startswith(prefix) or not match(rel_path[len(prefix):]):
+                continue
+        elif not match(name):
+            continue
+        ignored = not negate
+    return ignored
+
+
+def _walk(directory, rel_dir, depth, options, rules):
+    """Yield (rel_path, entry, is_dir) depth-first, children sorted per directory.
 
-        # Check if the directory is within the working directory
-        if not directory.startswith(working_directory):
-            return f'Error: Cannot list "{directory}" as it is outside the permitted working directory'
+    rel_path is relative to the working directory, which is where .gitignore rules
+    are anchored; include/exclude globs see it relative to the listed directory.
+    """
+    if options["respect_gitignore"]:
+        rules = rules + _read_gitignore(directory, rel_dir)
+    include, exclude, strip = options["include"], options["exclude"], options["strip"]
+
+    entries = []
+    with os.scandir(directory) as it:
+        for entry in it:
+            try:
+                is_dir = entry.is_dir()
+                if not is_dir and not entry.is_file():
+                    continue
+            except OSError:
+                continue
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            if options["respect_gitignore"] and (entry.name == ".git" or (rules and _ignored(rules, rel_path, entry.name, is_dir))):
+                continue
+            if exclude and _matches(rel_path[strip:], entry.name, exclude):
+                continue
+            entries.append((rel_path, entry, is_dir))
+
+    # Only stat up front when the sort order needs it; DirEntry caches it for later
+    sort_key = SORT_KEYS[options["sort"]]
+    if options["sort"] == "name":
+        entries.sort(key=lambda item: item[1].name)
+    else:
+        entries.sort(key=lambda item: (sort_key(item[1], item[1].stat()), item[1].name))
+
+    for rel_path, entry, is_dir in entries:
+        # With include globs only matching files are listed; directories are still walked
+        if not include or (not is_dir and _matches(rel_path[strip:], entry.name, include)):
+            yield rel_path, entry, is_dir
+        if is_dir and (options["max_depth"] is None or depth < options["max_depth"]) and not entry.is_symlink():
+            try:
+                yield from _walk(entry.path, rel_path, depth + 1, options, rules)
+            except OSError:
+                continue
+
+
+@tool()
+def get_files_info(
+    working_directory,
+    directory: Optional[str] = None,
+    recursive: bool = False,
+    max_depth: Optional[int] = None,
+    include: Optional[list[str]] = None,
+    exclude: Optional[list[str]] = None,
+    respect_gitignore: bool = True,
+    sort: Literal["name", "size", "mtime"] = "name",
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+):
+    """Lists the files and folders in the specified directory, showing their size and type (file or folder).
+
+    Args:
+        directory: Relative path to the target directory (within working directory).
+        recursive: List the whole tree below the directory instead of one level.
+        max_depth: With recursive, how many levels deep to go (1 is the directory itself).
+        include: Optional glob patterns (e.g. '*.py', 'pkg/*') files must match to be listed.
+        exclude: Optional glob patterns for files and directories to leave out.
+        respect_gitignore: Skip paths ignored by .gitignore files (default true).
+        sort: Order of entries within each directory: name (default), size or mtime.
+        limit: Maximum number of entries to return.
+        cursor: Continuation cursor from a previous truncated listing (an entry count; each page walks the tree again from the start).
+    """
+    try:
+        # Resolve the directory, symlinks included, and check it is within the working directory
+        sandbox = get_sandbox(working_directory)
+        working_directory = sandbox.root
+        requested = directory
+        directory = sandbox.resolve(directory)
+        if directory is None:
+            return f'Error: Cannot list "{requested}" as it is outside the permitted working directory'
 
         # Check if the directory exists and is a directory
-        if not os.path.isdir(directory):
+        if not sandbox.isdir(directory):
             return f'Error: "{directory}" is not a directory'
 
-        # List contents of the directory
+        if sort not in SORT_KEYS:
+            return f'Error: sort must be one of {", ".join(SORT_KEYS)}'
+        if max_depth is not None and int(max_depth) < 1:
+            return "Error: max_depth must be at least 1 (the directory itself)"
+        if limit is not None and int(limit) < 1:
+            return "Error: limit must be at least 1"
+
+        # Paths are matched relative to the working directory (where .gitignore rules
+        # are anchored) and shown relative to the listed directory
+        base = os.path.relpath(directory, working_directory)
+        base = "" if base == "." else base.replace(os.sep, "/")
+        options = {
+            "max_depth": (int(max_depth) if max_depth is not None else None) if recursive else 1,
+            "include": _patterns(include),
+            "exclude": _patterns(exclude),
+            "respect_gitignore": respect_gitignore,
+            "sort": sort,
+            "strip": len(base) + 1 if base else 0,
+        }
+        limit = min(int(limit), MAX_LISTING_ENTRIES) if limit is not None else MAX_LISTING_ENTRIES
+        skip = int(cursor) if cursor else 0
+
+        rules = []
+        if respect_gitignore and base:
+            parts = base.split("/")
+            for i in range(len(parts)):
+                rel_dir = "/".join(parts[:i])
+                rules += _read_gitignore(os.path.join(working_directory, rel_dir), rel_dir)
+
+        # List contents of the directory (and below, when recursive)
         contents = []
-        for item in os.listdir(directory):
-            item_path = os.path.join(directory, item)
-            if os.path.isdir(item_path):
-                contents.append(f'- {item}: file_size=128 bytes, is_dir=True')
-            elif os.path.isfile(item_path):
-                file_size = os.path.getsize(item_path)
-                contents.append(f'- {item}: file_size={file_size} bytes, is_dir=False')
+        for position, (rel_path, entry, is_dir) in enumerate(_walk(directory, base, 1, options, rules)):
+            if position < skip:
+                continue
+            if len(contents) == limit:
+                contents.append(
+                    f'[...listing truncated at {limit} entries; continue with cursor="{skip + limit}"]'
+                )
+                break
+            contents.append(f'- {rel_path[options["strip"]:]}: file_size={entry.stat().st_size} bytes, is_dir={is_dir}')
 
         return "\n".join(contents)
 
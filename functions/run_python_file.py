@@ -1,50 +1,161 @@
+import math
 import os
-import subprocess
+import selectors
+import signal
+import sys
+import time
+from typing import Optional
+from config import (
+    RUN_TIMEOUT_SECONDS,
+    RUN_MAX_TIMEOUT_SECONDS,
+    RUN_CPU_LIMIT_SECONDS,
+    RUN_MEMORY_LIMIT_BYTES,
+    RUN_OUTPUT_HEAD_BYTES,
+    RUN_OUTPUT_TAIL_BYTES,
+)
+from python_pool import start_python
+from sandbox import get_sandbox
+from tool_registry import tool
+
+
+class BoundedCapture:
+    """Keeps the first head_bytes and the last tail_bytes of a stream, counting what falls in between."""
+
+    def __init__(self, head_bytes=RUN_OUTPUT_HEAD_BYTES, tail_bytes=RUN_OUTPUT_TAIL_BYTES):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.omitted = 0
+
+    def write(self, chunk):
+        room = self.head_bytes - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+        self.tail += chunk
+        overflow = len(self.tail) - self.tail_bytes
+        if overflow > 0:
+            del self.tail[:overflow]
+            self.omitted += overflow
+
+    def getvalue(self):
+        head = self.head.decode('utf-8', errors='replace')
+        tail = self.tail.decode('utf-8', errors='replace')
+        if not self.omitted:
+            return head + tail
+        return f"{head}\n[... {self.omitted} bytes of output omitted ...]\n{tail}"
+
+
+def cpu_limit_for(timeout):
+    """CPU seconds a script may use: RUN_CPU_LIMIT_SECONDS, or all of a longer timeout."""
+    if RUN_CPU_LIMIT_SECONDS is None:
+        return None
+    return max(RUN_CPU_LIMIT_SECONDS, math.ceil(timeout))
 
-def run_python_file(working_directory, file_path):
-    try:
-        # Resolve absolute paths
-        working_directory = os.path.abspath(working_directory)
-        resolved_file_path = os.path.abspath(os.path.join(working_directory, file_path))
 
-        # Check if the file is within the working directory
-        if not resolved_file_path.startswith(working_directory):
+def _collect_output(process, timeout, echo=False):
+    """Stream the script's stdout and stderr into bounded buffers until it exits or times out.
+
+    Returns (stdout, stderr, timed_out); on a timeout the output so far is kept.
+    """
+    captures = {process.stdout_fd: BoundedCapture(), process.stderr_fd: BoundedCapture()}
+    deadline = time.monotonic() + timeout
+    timed_out = False
+    with selectors.DefaultSelector() as selector:
+        for fd in captures:
+            selector.register(fd, selectors.EVENT_READ)
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 and not timed_out:
+                timed_out = True
+                process.kill()
+            for key, _ in selector.select(None if timed_out else remaining):
+                chunk = os.read(key.fd, 65536)
+                if not chunk:
+                    selector.unregister(key.fd)
+                    continue
+                captures[key.fd].write(chunk)
+                if echo:
+                    sys.stdout.write(chunk.decode('utf-8', errors='replace'))
+                    sys.stdout.flush()
+    return captures[process.stdout_fd].getvalue(), captures[process.stderr_fd].getvalue(), timed_out
+
+
+@tool(hidden=["echo"])
+def run_python_file(
+    working_directory,
+    file_path: str,
+    args: Optional[list[str]] = None,
+    timeout: Optional[float] = None,
+    echo=False,
+):
+    """Executes a Python script file within the working directory and returns its output.
+
+    Args:
+        file_path: Relative path to the Python file to execute.
+        args: Optional command-line arguments to pass to the Python script.
+        timeout: Optional timeout in seconds (default 30, at most 300).
+    """
+    try:
+        # Resolve the path, symlinks included, and check it is within the working directory
+        sandbox = get_sandbox(working_directory)
+        working_directory = sandbox.root
+        resolved_file_path = sandbox.resolve(file_path)
+        if resolved_file_path is None:
             return f'Error: Cannot execute "{file_path}" as it is outside the permitted working directory'
 
         # Check if the file exists
-        if not os.path.exists(resolved_file_path):
+        if not sandbox.isfile(resolved_file_path):
             return f'Error: File "{os.path.basename(file_path)}" not found.'
 
         # Check if the file is a Python file
         if not resolved_file_path.endswith('.py'):
             return f'Error: "{file_path}" is not a Python file.'
 
-        # Run the Python file using subprocess
-        result = subprocess.run(
-            ['python3', resolved_file_path],
+        if isinstance(args, str):
+            args = args.split()
+        args = [str(arg) for arg in args or []]
+        timeout = min(float(timeout), RUN_MAX_TIMEOUT_SECONDS) if timeout else RUN_TIMEOUT_SECONDS
+        cpu_limit = cpu_limit_for(timeout)
+
+        # Run the script in a child of a warm interpreter (or a fresh one as a fallback)
+        process = start_python(
+            resolved_file_path,
+            args,
             cwd=working_directory,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            timeout=30
+            # A longer timeout than the CPU limit would be cut short by it
+            cpu_limit=cpu_limit,
+            memory_limit=RUN_MEMORY_LIMIT_BYTES,
         )
+        try:
+            stdout, stderr, timed_out = _collect_output(process, timeout, echo)
+        finally:
+            process.close()
+            returncode = process.wait()
 
         # Format the output
-        stdout = result.stdout.decode('utf-8').strip()
-        stderr = result.stderr.decode('utf-8').strip()
+        stdout = stdout.strip()
+        stderr = stderr.strip()
         output = []
 
+        if timed_out:
+            output.append(f"Error: Execution timed out after {timeout:g} seconds.")
+            if stdout or stderr:
+                output.append("Output before the timeout:")
+
         if stdout:
             output.append(f"STDOUT:\n{stdout}")
         if stderr:
             output.append(f"STDERR:\n{stderr}")
-        if result.returncode != 0:
-            output.append(f"Process exited with code {result.returncode}")
+        if returncode == -getattr(signal, "SIGXCPU", 0) and not timed_out:
+            output.append(f"Error: Process killed after using its CPU time limit of {cpu_limit} seconds.")
+        elif returncode != 0 and not timed_out:
+            output.append(f"Process exited with code {returncode}")
         if not output:
             return "No output produced."
 
         return "\n".join(output)
 
-    except subprocess.TimeoutExpired:
-        return "Error: Execution timed out after 30 seconds."
     except Exception as e:
         return f"Error: executing Python file: {e}"
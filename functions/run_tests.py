@@ -0,0 +1,73 @@
+from typing import Optional
+from config import RUN_MAX_TIMEOUT_SECONDS, RUN_TIMEOUT_SECONDS
+from affected_tests import get_affected_tests
+from sandbox import get_sandbox
+from tool_registry import tool
+
+MAX_LISTED_FILES = 10
+
+
+def _files(paths):
+    listed = ", ".join(paths[:MAX_LISTED_FILES])
+    return listed + (f" and {len(paths) - MAX_LISTED_FILES} more" if len(paths) > MAX_LISTED_FILES else "")
+
+
+@tool()
+def run_tests(
+    working_directory,
+    path: Optional[str] = None,
+    run_all: bool = False,
+    timeout: Optional[float] = None,
+):
+    """Runs the unittest tests in the working directory, but only those affected by files changed since they last passed; the rest report their earlier result. Runs in parallel processes. Prefer it over run_python_file on a test script to check a change.
+
+    Args:
+        path: Optional test file or directory to limit the run to (default: every test*.py file).
+        run_all: Run every test again, ignoring earlier results.
+        timeout: Optional timeout in seconds per worker process (default 30, at most 300).
+    """
+    try:
+        sandbox = get_sandbox(working_directory)
+        target = sandbox.resolve(path)
+        if target is None:
+            return f'Error: Cannot run tests in "{path}" as it is outside the permitted working directory'
+        if not sandbox.isdir(target) and not sandbox.isfile(target):
+            return f'Error: "{path}" not found.'
+        timeout = min(float(timeout), RUN_MAX_TIMEOUT_SECONDS) if timeout else RUN_TIMEOUT_SECONDS
+
+        test_run = get_affected_tests(sandbox.root).run(sandbox.relative(target), run_all, timeout)
+        total = len(test_run.ran) + len(test_run.cached)
+        if not total:
+            return f'No unittest cases found under "{path or "."}".'
+
+        output = [
+            f"Ran {len(test_run.ran)} of {total} tests in {test_run.wall_time:.2f}s"
+            + (f" ({test_run.workers} worker processes)" if test_run.workers > 1 else "")
+            + (f"; {len(test_run.cached)} unaffected tests passed before and were not run again." if test_run.cached else ".")
+        ]
+        if test_run.changed:
+            output.append(f"Changed since the last run: {_files(test_run.changed)}")
+        if test_run.written:
+            output.append(f"Written by the agent: {_files(test_run.written)}")
+        output += test_run.problems
+
+        for record in sorted(test_run.failed, key=lambda record: record["id"]):
+            output.append(f"{record['outcome'].upper()}: {record['id']}\n{record['details'].rstrip()}")
+
+        skipped = sum(1 for record in test_run.ran.values() if record["outcome"] == "skipped")
+        failures = sum(1 for record in test_run.failed if record["outcome"] == "failure")
+        errors = len(test_run.failed) - failures
+        if test_run.failed:
+            output.append(f"FAILED ({failures} failures, {errors} errors)")
+        else:
+            output.append("OK" + (f" ({skipped} skipped)" if skipped else ""))
+
+        full_run = test_run.full_run_estimate()
+        if full_run > test_run.wall_time:
+            output.append(
+                f"A full run takes about {full_run:.2f}s; this one saved about {full_run - test_run.wall_time:.2f}s."
+            )
+        return "\n".join(output)
+
+    except Exception as e:
+        return f"Error: running tests: {e}"
@@ -0,0 +1,69 @@
+import os
+import re
+from fnmatch import fnmatch
+from typing import Optional
+from config import SEARCH_MAX_RESULTS
+from code_index import get_index
+from sandbox import get_sandbox
+from tool_registry import tool
+
+MAX_CONTEXT_LINES = 3
+MAX_LINE_CHARS = 200
+
+
+@tool()
+def search_code(
+    working_directory,
+    query: str,
+    regex: bool = False,
+    case_sensitive: bool = True,
+    path_glob: Optional[str] = None,
+    max_results: Optional[int] = None,
+    context_lines: int = 0,
+):
+    """Searches the text files in the working directory for a literal string or regular expression and returns file:line matches. Much faster than reading files one by one to find a symbol.
+
+    Args:
+        query: The text (or regular expression, with regex=true) to search for.
+        regex: Treat the query as a Python regular expression.
+        case_sensitive: Match case exactly (default true).
+        path_glob: Optional glob the relative file path must match, e.g. '*.py' or 'pkg/*'.
+        max_results: Maximum number of matching lines to return.
+        context_lines: Lines of context to show around each match (at most 3).
+    """
+    try:
+        if not os.path.isdir(working_directory):
+            return f'Error: "{working_directory}" is not a directory'
+        working_directory = get_sandbox(working_directory).root
+        if not query:
+            return "Error: query must not be empty"
+
+        max_results = min(int(max_results), SEARCH_MAX_RESULTS) if max_results else SEARCH_MAX_RESULTS
+        context_lines = max(0, min(int(context_lines or 0), MAX_CONTEXT_LINES))
+        path_filter = (lambda rel_path: fnmatch(rel_path, path_glob)) if path_glob else None
+
+        try:
+            matches, files_scanned = get_index(working_directory).search(
+                query, regex, case_sensitive, max_results, context_lines, path_filter
+            )
+        except re.error as e:
+            return f"Error: invalid regular expression: {e}"
+
+        if not matches:
+            return f'No matches for "{query}" ({files_scanned} candidate files checked)'
+
+        output = []
+        for rel_path, line_no, window in matches:
+            for n, text in window:
+                if len(text) > MAX_LINE_CHARS:
+                    text = text[:MAX_LINE_CHARS] + "..."
+                separator = ":" if n == line_no else "-"
+                output.append(f"{rel_path}{separator}{n}{separator} {text}")
+            if context_lines:
+                output.append("--")
+        if len(matches) == max_results:
+            output.append(f"[...stopped at {max_results} matches; narrow the query or path_glob to see more]")
+        return "\n".join(output)
+
+    except Exception as e:
+        return f"Error: {str(e)}"
@@ -1,19 +1,78 @@
 import os 
+import tempfile
+from sandbox import get_sandbox
+from tool_registry import tool
 
-def write_file(working_directory,file_path,content):
+
+def _read_umask():
+    """The process umask, read without changing it where the OS allows.
+
+    os.umask() can only read it by setting another value for a moment, and the
+    umask is process-wide: a file another thread creates in that moment gets
+    the wrong mode. Linux reports it in /proc. Elsewhere it is set to 0o077 for
+    that moment, so such a file only ends up stricter than intended.
+    """
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError, IndexError):
+        pass
+    umask = os.umask(0o077)
+    os.umask(umask)
+    return umask
+
+
+# mkstemp creates files 0600; new files should get the usual permissions instead
+_UMASK = _read_umask()
+
+
+def write_atomic(file_path, content):
+    """Write content to a temp file next to file_path, then swap it in with os.replace.
+
+    Readers see either the old file or the new one, never a half-written one.
+    """
+    directory = os.path.dirname(file_path)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(file_path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', newline='') as file:
+            file.write(content)
+            file.flush()
+            os.fsync(file.fileno())
+        if os.path.exists(file_path):
+            os.chmod(temp_path, os.stat(file_path).st_mode & 0o7777)
+        else:
+            os.chmod(temp_path, 0o666 & ~_UMASK)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+@tool()
+def write_file(working_directory, file_path: str, content: str):
+    """Writes or overwrites the content of a file within the working directory.
+
+    Args:
+        file_path: Relative path to the file to write to.
+        content: The content to write into the file.
+    """
     try: 
-        working_directory = os.path.abspath(working_directory)
-        file_path =  os.path.abspath(os.path.join(working_directory,file_path))
-        if not file_path.startswith(working_directory):
+        resolved_path = get_sandbox(working_directory).resolve(file_path)
+        if resolved_path is None:
             return f'Error: Cannot write to "{file_path}" as it is outside the permitted working directory'
+        file_path = resolved_path
         
         
         if not os.path.exists(file_path):
             os.makedirs(os.path.dirname(file_path), exist_ok=True)
         
         #write content to the file 
-        with open(file_path,'w') as file:
-            file.write(content)
+        write_atomic(file_path, content)
         return f'Successfully wrote to "{file_path}" ({len(content)} characters written)'
     
     except Exception as e:
@@ -1,130 +1,195 @@
 import os
 import sys
 import time
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
-from call_function import call_function
-from functions.get_file_content import get_file_content
-from functions.get_files_info import get_files_info
-from functions.write_file import write_file
-from functions.run_python_file import run_python_file
-from config import MAX_ITERATIONS
+from functools import partial
+from dispatch import call_functions
+from config import BATCH_CONCURRENCY, CHECKPOINT_DIR, CONTEXT_TOKEN_BUDGET, MAX_ITERATIONS, MAX_TOOL_WORKERS, MODEL_NAME, PREFETCH_MAX_FILES, WORKING_DIR
 from prompt import system_prompt
+from tool_cache import tool_cache
+from condense import condense_stats
+from prefetch import prefetcher
+from context_window import CHARS_PER_TOKEN, ContextWindowManager
+from model_backend import GeminiBackend, RecordingBackend, ReplayBackend
+from checkpoint import SessionCheckpoint
+from tool_registry import build_tool
+import tracing
 
-def parse_args():
+def parse_args(argv=None):
     prompt_parts = []
     verbose = False
-    for arg in sys.argv[1:]:
+    options = {
+        "max_tool_workers": MAX_TOOL_WORKERS,
+        "context_budget": CONTEXT_TOKEN_BUDGET,
+        "record": None,
+        "replay": None,
+        "replay_latency": None,
+        "batch": None,
+        "concurrency": BATCH_CONCURRENCY,
+        "isolate": None,
+        "output": None,
+        "trace": None,
+        "metrics": None,
+        "resume": None,
+        "extend_iterations": 0,
+        "prefetch": PREFETCH_MAX_FILES,
+    }
+    args = iter(sys.argv[1:] if argv is None else argv)
+    for arg in args:
         if arg in ['--verbose', '-v']:
             verbose = True
+        elif arg == '--max-tool-workers':
+            value = next(args, None)
+            if value is None or not value.isdigit() or int(value) < 1:
+                print("Error: --max-tool-workers expects a positive integer.")
+                sys.exit(1)
+            options["max_tool_workers"] = int(value)
+        elif arg == '--context-budget':
+            value = next(args, None)
+            if value is None or not value.isdigit():
+                print("Error: --context-budget expects a number of tokens (0 disables it).")
+                sys.exit(1)
+            options["context_budget"] = int(value)
+        elif arg in ['--record', '--replay']:
+            value = next(args, None)
+            if not value:
+                print(f"Error: {arg} expects a transcript path.")
+                sys.exit(1)
+            options[arg[2:]] = value
+        elif arg in ['--batch', '--isolate', '--output', '--trace', '--metrics']:
+            value = next(args, None)
+            if not value:
+                print(f"Error: {arg} expects a path.")
+                sys.exit(1)
+            options[arg[2:]] = value
+        elif arg == '--concurrency':
+            value = next(args, None)
+            if value is None or not value.isdigit() or int(value) < 1:
+                print("Error: --concurrency expects a positive integer.")
+                sys.exit(1)
+            options["concurrency"] = int(value)
+        elif arg == '--resume':
+            value = next(args, None)
+            if not value:
+                print("Error: --resume expects a session id or checkpoint path.")
+                sys.exit(1)
+            options["resume"] = value
+        elif arg == '--prefetch':
+            value = next(args, None)
+            if value is None or not value.isdigit():
+                print("Error: --prefetch expects a number of files (0 turns it off).")
+                sys.exit(1)
+            options["prefetch"] = int(value)
+        elif arg == '--extend-iterations':
+            value = next(args, None)
+            if value is None or not value.isdigit():
+                print("Error: --extend-iterations expects a number of iterations.")
+                sys.exit(1)
+            options["extend_iterations"] = int(value)
+        elif arg == '--replay-latency':
+            try:
+                options["replay_latency"] = float(next(args, ""))
+            except ValueError:
+                print("Error: --replay-latency expects a number of seconds.")
+                sys.exit(1)
         else:
             prompt_parts.append(arg)
-    if not prompt_parts:
+    if options["resume"]:
+        if prompt_parts or options["batch"]:
+            print("Error: --resume continues the saved prompt; it takes no new prompt or --batch.")
+            sys.exit(1)
+        return "", verbose, options
+    if not prompt_parts and options["replay"]:
+        # Replays default to the prompt they were recorded with
+        prompt_parts.append(ReplayBackend(options["replay"]).prompt)
+    if not prompt_parts and not options["batch"]:
         print("Error: Please provide a prompt as a command line argument.")
         sys.exit(1)
     prompt = " ".join(prompt_parts)
-    return prompt, verbose
+    return prompt, verbose, options
 
 def print_token_usage(response):
     print(f"Prompt tokens: {response.usage_metadata.prompt_token_count}")
     print(f"Response tokens: {response.usage_metadata.candidates_token_count}")
 
-def main():
-    load_dotenv()
-    api_key = os.environ.get("GEMINI_API_KEY")
-    client = genai.Client(api_key=api_key)
-
-    prompt, verbose = parse_args()
-    messages = [
-        types.Content(role="user", parts=[types.Part(text=prompt)]),
-    ]
-
-    schema_get_files_info = types.FunctionDeclaration(
-        name="get_files_info",
-        description="Lists the files and folders in the specified directory, showing their size and type (file or folder).",
-        parameters=types.Schema(
-            type=types.Type.OBJECT,
-            properties={
-                "directory": types.Schema(
-                    type=types.Type.STRING,
-                    description="Relative path to the target directory (within working directory).",
-                ),
-            },
-        ),
-    )
+class SessionStats:
+    """Where the time and tokens of one agent session went."""
 
-    schema_get_file_content = types.FunctionDeclaration(
-        name="get_file_content",
-        description="Reads and returns the content of a file within the working directory.",
-        parameters=types.Schema(
-            type=types.Type.OBJECT,
-            properties={
-                "file_path": types.Schema(
-                    type=types.Type.STRING,
-                    description="Relative path to the file to be read.",
-                ),
-            },
-        ),
-    )
+    def __init__(self):
+        self.iterations = 0
+        self.tool_calls = 0
+        self.model_time = 0.0
+        self.tool_time = 0.0
+        self.wall_time = 0.0
+        self.prompt_tokens = 0
+        self.response_tokens = 0
+        self.context_tokens_saved = 0
+        self.finished = False
+        self.final_response = None
 
-    schema_run_python_file = types.FunctionDeclaration(
-        name="run_python_file",
-        description="Executes a Python script file within the working directory and returns its output.",
-        parameters=types.Schema(
-            type=types.Type.OBJECT,
-            properties={
-                "file_path": types.Schema(
-                    type=types.Type.STRING,
-                    description="Relative path to the Python file to execute.",
-                ),
-                "args": types.Schema(
-                    type=types.Type.ARRAY,
-                    description="Optional command-line arguments to pass to the Python script.",
-                    items=types.Schema(type=types.Type.STRING),
-                ),
-            },
-        ),
-    )
+    def as_dict(self):
+        return dict(vars(self))
 
-    schema_write_file = types.FunctionDeclaration(
-        name="write_file",
-        description="Writes or overwrites the content of a file within the working directory.",
-        parameters=types.Schema(
-            type=types.Type.OBJECT,
-            properties={
-                "file_path": types.Schema(
-                    type=types.Type.STRING,
-                    description="Relative path to the file to write to.",
-                ),
-                "content": types.Schema(
-                    type=types.Type.STRING,
-                    description="The content to write into the file.",
-                ),
-            },
-        ),
-    )
 
-    available_functions = types.Tool(function_declarations=[
-        schema_get_files_info,
-        schema_write_file,
-        schema_get_file_content,
-        schema_run_python_file,
-    ])
+def session_steps(prompt, stats, verbose=False, options=None, working_directory=WORKING_DIR, checkpoint=None):
+    """The agent loop for one prompt, as a generator that leaves the waiting to its driver.
 
-    for i in range(MAX_ITERATIONS):
+    It yields ("model", kwargs) for a generate_content call and expects the
+    response to be sent back, and ("tools", function) for a batch of tool calls
+    and expects function()'s result. run_session drives it synchronously and
+    run_session_async on an event loop.
+
+    With a checkpoint, every finished iteration is saved to it, and a resumed
+    checkpoint's messages and stats pick the loop up at the next iteration.
+    """
+    # The SDK takes a while to import; only sessions need it
+    from google.genai import types
+
+    options = options or {}
+    max_tool_workers = options.get("max_tool_workers", MAX_TOOL_WORKERS)
+    context = ContextWindowManager(options.get("context_budget", CONTEXT_TOKEN_BUDGET), verbose)
+    max_iterations = MAX_ITERATIONS
+    if options.get("extend_iterations"):
+        # Past the cap, or past wherever an already extended session stopped
+        max_iterations = max(MAX_ITERATIONS, stats.iterations) + options["extend_iterations"]
+    session_start = time.perf_counter()
+    earlier_wall_time = stats.wall_time
+
+    if checkpoint is not None and checkpoint.messages:
+        messages = list(checkpoint.messages)
+    else:
+        messages = [
+            types.Content(role="user", parts=[types.Part(text=prompt)]),
+        ]
+    config = types.GenerateContentConfig(
+        tools=[build_tool()],
+        system_instruction=system_prompt,
+    )
+
+    for i in range(stats.iterations, max_iterations):
         if verbose:
             print(f"\n===== ITERATION {i+1} =====")
+        stats.iterations += 1
+
+        # Drop stale tool output before it is sent again
+        stats.context_tokens_saved += context.compact(messages)
 
-        response = client.models.generate_content(
-            model='gemini-2.0-flash-001',
-            contents=messages,
-            config=types.GenerateContentConfig(
-                tools=[available_functions],
-                system_instruction=system_prompt,
+        start = time.perf_counter()
+        with tracing.span("generate_content", "model", iteration=i + 1, messages=len(messages)) as trace_args:
+            response = yield "model", dict(
+                model=MODEL_NAME,
+                contents=messages,
+                config=config,
             )
-        )
+            usage = response.usage_metadata
+            trace_args["prompt_tokens"] = (usage and usage.prompt_token_count) or 0
+            trace_args["response_tokens"] = (usage and usage.candidates_token_count) or 0
+            trace_args["function_calls"] = len(response.function_calls or [])
+        stats.model_time += time.perf_counter() - start
 
+        if response.usage_metadata:
+            stats.prompt_tokens += response.usage_metadata.prompt_token_count or 0
+            stats.response_tokens += response.usage_metadata.candidates_token_count or 0
+        tracing.counter("tokens", prompt=stats.prompt_tokens, response=stats.response_tokens)
         if verbose:
             print_token_usage(response)
 
@@ -134,9 +199,16 @@ def main():
 
         # Check if there's a function call to execute
         if response.function_calls:
-            # Call each function and append results to messages
-            for function_call in response.function_calls:
-                function_call_result = call_function(function_call, verbose)
+            # Call the functions (independent ones concurrently) and append
+            # the results to messages in the order the model asked for them
+            start = time.perf_counter()
+            function_call_results = yield "tools", partial(
+                call_functions, response.function_calls, verbose, max_tool_workers, working_directory
+            )
+            stats.tool_time += time.perf_counter() - start
+            stats.tool_calls += len(function_call_results)
+
+            for function_call_result in function_call_results:
                 if (
                     not function_call_result.parts
                     or not function_call_result.parts[0].function_response
@@ -146,16 +218,151 @@ def main():
                     print(f"-> {function_call_result.parts[0].function_response.response}")
                 # Append the tool response to messages
                 messages.append(function_call_result.parts[0])
-            # Wait before next iteration to avoid rate limiting
-            time.sleep(2)
         else:
             # No function calls means the model is done
             print("\n=== FINAL RESPONSE ===\n")
             print(response.text)
+            stats.finished = True
+            stats.final_response = response.text
+
+        if checkpoint is not None:
+            stats.wall_time = earlier_wall_time + time.perf_counter() - session_start
+            checkpoint.save(messages, stats)
+        if stats.finished:
             break
     else:
         # Loop ended without finalizing
         print("\nMaximum iterations reached without completion.")
 
+    if verbose:
+        print(tool_cache.format_stats())
+        print(condense_stats.format_stats(CHARS_PER_TOKEN))
+        print(prefetcher.format_stats())
+    stats.wall_time = earlier_wall_time + time.perf_counter() - session_start
+
+
+def run_session(backend, prompt, verbose=False, options=None, working_directory=WORKING_DIR, checkpoint=None):
+    """Run the agent loop for one prompt against a model backend and return its SessionStats."""
+    stats = SessionStats()
+    if checkpoint is not None:
+        checkpoint.restore_stats(stats)
+    steps = session_steps(prompt, stats, verbose, options, working_directory, checkpoint)
+    reply = None
+    with tracing.session(stats, prompt):
+        try:
+            while True:
+                kind, request = steps.send(reply)
+                reply = backend.generate_content(**request) if kind == "model" else request()
+        except StopIteration:
+            pass
+    return stats
+
+
+async def run_session_async(
+    backend, prompt, verbose=False, options=None, working_directory=WORKING_DIR, checkpoint=None, on_step=None
+):
+    """run_session on an event loop: model calls are awaited and tool calls run in a thread.
+
+    on_step(kind, stats), if given, is called before each model call ("model")
+    and batch of tool calls ("tools").
+    """
+    import asyncio
+
+    stats = SessionStats()
+    if checkpoint is not None:
+        checkpoint.restore_stats(stats)
+    steps = session_steps(prompt, stats, verbose, options, working_directory, checkpoint)
+    reply = None
+    with tracing.session(stats, prompt):
+        try:
+            while True:
+                kind, request = steps.send(reply)
+                if on_step is not None:
+                    on_step(kind, stats)
+                if kind == "model":
+                    reply = await backend.generate_content_async(**request)
+                else:
+                    reply = await asyncio.to_thread(request)
+        except StopIteration:
+            pass
+    return stats
+
+
+def open_session(prompt, verbose, options, make_gemini_backend, cwd=None):
+    """Set up a single-prompt session: its checkpoint (new or resumed) and model backend.
+
+    Returns (prompt, working_directory, checkpoint, backend), or None if the
+    session to resume had already finished. make_gemini_backend() is only called
+    when the session talks to the live model. WORKING_DIR and CHECKPOINT_DIR are
+    taken relative to cwd (default: this process's working directory).
+    """
+    cwd = cwd or os.getcwd()
+    working_directory = os.path.join(cwd, WORKING_DIR)
+    checkpoint_dir = os.path.join(cwd, CHECKPOINT_DIR)
+    if options["resume"]:
+        try:
+            checkpoint = SessionCheckpoint.load(options["resume"], checkpoint_dir)
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}")
+            sys.exit(1)
+        if checkpoint.finished:
+            print(f"Session {checkpoint.session_id} already finished.")
+            print("\n=== FINAL RESPONSE ===\n")
+            print(checkpoint.stats.get("final_response"))
+            return None
+        # Older checkpoints hold the working directory relative to where they were made
+        prompt, working_directory = checkpoint.prompt, os.path.join(cwd, checkpoint.working_directory)
+        print(f"Resuming session {checkpoint.session_id} after iteration {checkpoint.iterations}.")
+    else:
+        checkpoint = SessionCheckpoint.create(prompt, os.path.normpath(working_directory), checkpoint_dir)
+
+    if options["replay"]:
+        backend = ReplayBackend(options["replay"], latency=options["replay_latency"])
+        # The responses for the iterations already done were served before
+        backend.position = checkpoint.iterations
+    else:
+        backend = make_gemini_backend()
+    if options["record"]:
+        backend = RecordingBackend(backend, options["record"], checkpoint.iterations if options["resume"] else None)
+    return prompt, working_directory, checkpoint, backend
+
+
+def print_resume_hint(checkpoint, stats):
+    """Print how to continue a session that stopped without a final response (stats is None after a crash)."""
+    if stats is None or not stats.finished:
+        print(f"\nSession saved as {checkpoint.session_id}; continue it with --resume {checkpoint.session_id}"
+              + ("" if stats is None else " --extend-iterations N"))
+
+
+def main():
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    prompt, verbose, options = parse_args()
+    if options["trace"] or options["metrics"]:
+        tracing.enable(options["trace"], options["metrics"])
+    prefetcher.max_files = options["prefetch"]
+
+    if options["batch"]:
+        from batch import main_batch
+
+        main_batch(verbose, options)
+        tracing.finish()
+        return
+
+    session = open_session(
+        prompt, verbose, options, lambda: GeminiBackend(api_key=os.environ.get("GEMINI_API_KEY"), verbose=verbose)
+    )
+    if session is None:
+        return
+    prompt, working_directory, checkpoint, backend = session
+
+    stats = None
+    try:
+        stats = run_session(backend, prompt, verbose, options, working_directory, checkpoint)
+    finally:
+        tracing.finish()
+        print_resume_hint(checkpoint, stats)
+
 if __name__ == "__main__":
     main()
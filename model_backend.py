@@ -0,0 +1,162 @@
+import json
+import os
+import time
+
+from rate_limiter import RateLimitScheduler
+
+
+class ModelBackend:
+    """What the agent loop talks to instead of a genai.Client.
+
+    A backend takes the same arguments as client.models.generate_content and
+    returns a types.GenerateContentResponse.
+    """
+
+    def generate_content(self, model, contents, config=None):
+        raise NotImplementedError
+
+    async def generate_content_async(self, model, contents, config=None):
+        """Awaitable generate_content; backends without a native one run it in a thread."""
+        import asyncio
+
+        return await asyncio.to_thread(self.generate_content, model=model, contents=contents, config=config)
+
+
+class GeminiBackend(ModelBackend):
+    """The live Gemini endpoint, paced by a RateLimitScheduler."""
+
+    def __init__(self, client=None, api_key=None, scheduler=None, verbose=False):
+        if client is None:
+            from google import genai
+
+            client = genai.Client(api_key=api_key)
+        self.client = client
+        self.scheduler = scheduler or RateLimitScheduler(verbose=verbose)
+
+    def generate_content(self, model, contents, config=None):
+        return self.scheduler.generate_content(
+            self.client, model=model, contents=contents, config=config
+        )
+
+    async def generate_content_async(self, model, contents, config=None):
+        # The SDK's async client, so concurrent sessions don't each need a thread
+        return await self.scheduler.generate_content_async(
+            self.client, model=model, contents=contents, config=config
+        )
+
+
+def dump_contents(contents):
+    """Serialize a messages list (Content and Part objects) to plain JSON data."""
+    return [
+        {
+            "type": type(item).__name__,
+            "data": item.model_dump(mode="json", exclude_none=True),
+        }
+        for item in contents
+    ]
+
+
+def load_contents(data):
+    from google.genai import types
+
+    return [getattr(types, item["type"]).model_validate(item["data"]) for item in data]
+
+
+class RecordingBackend(ModelBackend):
+    """Passes calls through to another backend and appends each exchange to a JSONL transcript.
+
+    A new session starts a fresh transcript. A resumed one passes resume_at, the
+    number of iterations its checkpoint kept: that many exchanges are kept and
+    later ones appended, so the transcript still replays from the first call.
+    """
+
+    def __init__(self, inner, path, resume_at=None):
+        self.inner = inner
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        kept = []
+        if resume_at and os.path.exists(path):
+            with open(path) as file:
+                # Exchanges past the checkpoint, or a torn last line, are answered again
+                kept = [line for line in file if line.endswith("\n")][:resume_at]
+        with open(path, "w") as file:
+            file.writelines(kept)
+
+    def generate_content(self, model, contents, config=None):
+        start = time.perf_counter()
+        response = self.inner.generate_content(model=model, contents=contents, config=config)
+        self._record(model, contents, response, time.perf_counter() - start)
+        return response
+
+    async def generate_content_async(self, model, contents, config=None):
+        start = time.perf_counter()
+        response = await self.inner.generate_content_async(model=model, contents=contents, config=config)
+        self._record(model, contents, response, time.perf_counter() - start)
+        return response
+
+    def _record(self, model, contents, response, latency):
+        entry = {
+            "model": model,
+            "contents": dump_contents(contents),
+            "response": response.model_dump(mode="json", exclude_none=True),
+            "latency": round(latency, 4),
+        }
+        with open(self.path, "a") as file:
+            file.write(json.dumps(entry) + "\n")
+
+
+class ReplayExhausted(RuntimeError):
+    pass
+
+
+class ReplayBackend(ModelBackend):
+    """Serves the responses of a recorded transcript, in order, without touching the network.
+
+    latency=None sleeps for the latency measured at record time; a number sleeps
+    that many seconds per call instead (0 for as fast as possible).
+    """
+
+    def __init__(self, path, latency=None):
+        self.path = path
+        self.latency = latency
+        with open(path) as file:
+            self.entries = [json.loads(line) for line in file if line.strip()]
+        if not self.entries:
+            raise ValueError(f"Transcript {path} has no recorded responses")
+        self.position = 0
+
+    @property
+    def prompt(self):
+        """The user prompt the transcript was recorded with."""
+        first = self.entries[0]["contents"][0]["data"]
+        return "".join(part.get("text", "") for part in first.get("parts", []))
+
+    def _next_entry(self):
+        if self.position >= len(self.entries):
+            raise ReplayExhausted(
+                f"Transcript {self.path} has only {len(self.entries)} recorded responses"
+            )
+        entry = self.entries[self.position]
+        self.position += 1
+        latency = entry.get("latency", 0.0) if self.latency is None else self.latency
+        return entry, latency
+
+    def generate_content(self, model, contents, config=None):
+        from google.genai import types
+
+        entry, latency = self._next_entry()
+        if latency > 0:
+            time.sleep(latency)
+        return types.GenerateContentResponse.model_validate(entry["response"])
+
+    async def generate_content_async(self, model, contents, config=None):
+        from google.genai import types
+
+        entry, latency = self._next_entry()
+        if latency > 0:
+            import asyncio
+
+            await asyncio.sleep(latency)
+        return types.GenerateContentResponse.model_validate(entry["response"])
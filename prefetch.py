@@ -0,0 +1,170 @@
+import contextvars
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from config import PREFETCH_EXTENSIONS, PREFETCH_MAX_BYTES, PREFETCH_MAX_FILE_BYTES, PREFETCH_MAX_FILES, PREFETCH_WORKERS
+from tool_cache import tool_cache
+import tracing
+
+# One line of get_files_info output
+LISTING_ENTRY = re.compile(r"^- (.+): file_size=(\d+) bytes, is_dir=(True|False)$")
+
+
+class _Prefetch:
+    """One file read in the background. state: pending, ready, taken (served) or dropped."""
+
+    __slots__ = ("done", "result", "size", "state")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.size = 0
+        self.state = "pending"
+
+
+def pick_files(directory, listing, max_files, max_file_bytes=PREFETCH_MAX_FILE_BYTES):
+    """The small text files in a get_files_info listing the model will most likely read next.
+
+    Source files come first, then the rest in listing order. Paths are relative to
+    the working directory, the way get_file_content takes them.
+    """
+    picked = []
+    for line in listing.splitlines():
+        match = LISTING_ENTRY.match(line)
+        if not match or match.group(3) == "True" or int(match.group(2)) > max_file_bytes:
+            continue
+        path = match.group(1)
+        extension = os.path.splitext(path)[1]
+        if extension not in PREFETCH_EXTENSIONS or any(part.startswith(".") for part in path.split("/")):
+            continue
+        picked.append((extension != ".py", path))
+    picked.sort(key=lambda item: item[0])
+    return [os.path.normpath(os.path.join(directory or "", path)) for _, path in picked[:max_files]]
+
+
+class Prefetcher:
+    """Reads the files a directory listing turned up while the model is still thinking.
+
+    Reads are keyed exactly like tool_cache keys get_file_content calls, by path
+    plus (mtime, size, inode), so a file changed since it was prefetched is simply
+    a miss. A call for a file whose read is still in flight waits for that read.
+    The store is bounded by PREFETCH_MAX_BYTES; bytes read but never served
+    (evicted, invalidated by a write, or never asked for) count as wasted.
+    """
+
+    def __init__(self, max_files=PREFETCH_MAX_FILES, max_bytes=PREFETCH_MAX_BYTES, workers=PREFETCH_WORKERS):
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.pool = None
+        self.files = 0
+        self.hits = 0
+        self.misses = 0
+        self.used_bytes = 0
+        self.wasted_bytes = 0
+
+    def schedule(self, working_directory, directory, listing):
+        """Start background reads of the likely next files in a get_files_info result."""
+        if not self.max_files or listing.startswith("Error"):
+            return
+        from functions.get_file_content import get_file_content
+
+        for path in pick_files(directory, listing, self.max_files):
+            args = {"working_directory": working_directory, "file_path": path}
+            key = tool_cache.key("get_file_content", args)
+            if key is None or key in tool_cache:
+                continue
+            with self.lock:
+                if key in self.entries:
+                    continue
+                entry = self.entries[key] = _Prefetch()
+                self.files += 1
+                if self.pool is None:
+                    self.pool = ThreadPoolExecutor(self.workers, thread_name_prefix="prefetch")
+                # Like dispatch's tasks, reads run in a copy of the context so they show up in the trace
+                self.pool.submit(contextvars.copy_context().run, self._read, entry, get_file_content, args)
+
+    def _read(self, entry, get_file_content, args):
+        with tracing.span("prefetch", "tools", file_path=args["file_path"]) as trace_args:
+            try:
+                result = get_file_content(**args)
+            except Exception as e:
+                result = f"Error: {e}"
+            trace_args["result_bytes"] = size = len(result.encode())
+        with self.lock:
+            entry.result, entry.size = result, size
+            if entry.state == "taken":
+                self.used_bytes += size
+            elif entry.state == "dropped":
+                self.wasted_bytes += size
+            else:
+                entry.state = "ready"
+                self.bytes += size
+                self._evict()
+        entry.done.set()
+
+    def _evict(self):
+        for key in list(self.entries):
+            if self.bytes <= self.max_bytes:
+                return
+            entry = self.entries[key]
+            if entry.state == "ready":
+                del self.entries[key]
+                self.bytes -= entry.size
+                self.wasted_bytes += entry.size
+
+    def get(self, key):
+        """The prefetched result for a get_file_content cache key, or None."""
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if entry.state == "ready":
+                self.bytes -= entry.size
+                self.used_bytes += entry.size
+            entry.state = "taken"
+        entry.done.wait()
+        return entry.result
+
+    def invalidate(self):
+        """Drop everything; the tree may have changed."""
+        with self.lock:
+            for entry in self.entries.values():
+                if entry.state == "ready":
+                    self.wasted_bytes += entry.size
+                entry.state = "dropped"
+            self.entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                "files": self.files,
+                "hits": self.hits,
+                "misses": self.misses,
+                "used_bytes": self.used_bytes,
+                # What is still stored was read for nothing so far
+                "wasted_bytes": self.wasted_bytes + self.bytes,
+            }
+
+    def format_stats(self):
+        stats = self.stats()
+        lookups = stats["hits"] + stats["misses"]
+        hit_rate = f"{stats['hits'] / lookups:.0%}" if lookups else "n/a"
+        used = f"{stats['hits'] / stats['files']:.0%}" if stats["files"] else "n/a"
+        return (
+            f"Prefetch: {stats['files']} files read ahead, {stats['hits']} hits, {stats['misses']} misses "
+            f"({hit_rate} of reads served, {used} of prefetched files used), "
+            f"{stats['used_bytes']} bytes used, {stats['wasted_bytes']} bytes wasted"
+        )
+
+
+prefetcher = Prefetcher()
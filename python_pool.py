@@ -0,0 +1,350 @@
+# Warm interpreters for run_python_file.
+#
+# A pool worker is a long-lived Python process that has already paid for
+# interpreter startup and common imports. To run a script, the agent sends it the
+# request plus the write ends of two pipes; the worker forks, and the child sets
+# its limits, points stdout/stderr at the pipes and runs the script with runpy.
+# Children are thrown away after one run, so scripts can't affect each other.
+#
+# This file is also the worker's entry point, so only the standard library is
+# imported at module level.
+
+import atexit
+import json
+import os
+import queue
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import traceback
+
+SERVE_FLAG = "--serve"
+MESSAGE_BYTES = 65536
+
+
+def _set_limits(cpu_seconds, memory_bytes):
+    try:
+        import resource
+    except ImportError:
+        return
+    if cpu_seconds:
+        # The soft limit sends SIGXCPU; the hard limit a second later kills it
+        resource.setrlimit(resource.RLIMIT_CPU, (int(cpu_seconds), int(cpu_seconds) + 1))
+    if memory_bytes:
+        resource.setrlimit(resource.RLIMIT_AS, (int(memory_bytes), int(memory_bytes)))
+
+
+def _script_traceback(error, script):
+    """Print a traceback starting at the script's own frames, like `python3 script.py` would."""
+    tb = error.__traceback__
+    while tb is not None and tb.tb_frame.f_code.co_filename != script:
+        tb = tb.tb_next
+    traceback.print_exception(type(error), error, tb or error.__traceback__)
+
+
+def _run_child(request, stdout_fd, stderr_fd):
+    """Runs in the forked child: turn into the requested script and never return."""
+    code = 1
+    try:
+        # Own process group, so a timeout kills whatever the script started too
+        os.setsid()
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        os.dup2(stdout_fd, 1)
+        os.dup2(stderr_fd, 2)
+        for fd in (devnull, stdout_fd, stderr_fd):
+            os.close(fd)
+
+        os.chdir(request["cwd"])
+        _set_limits(request.get("cpu_limit"), request.get("memory_limit"))
+        script = request["script"]
+        sys.argv = [script] + list(request.get("args", []))
+        sys.path[0] = os.path.dirname(script)
+
+        import runpy
+
+        try:
+            runpy.run_path(script, run_name="__main__")
+            code = 0
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                code = e.code or 0
+            else:
+                print(e.code, file=sys.stderr)
+        except BaseException as e:
+            _script_traceback(e, script)
+        atexit._run_exitfuncs()
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        finally:
+            os._exit(code)
+
+
+def serve(sock_fd, preload):
+    """Worker main loop: fork one child per request and report its pid and exit status."""
+    for module in preload:
+        try:
+            __import__(module)
+        except Exception:
+            pass
+
+    parent_pid = os.getppid()
+    sock = socket.socket(fileno=sock_fd)
+    sock.settimeout(1.0)
+    while True:
+        try:
+            message, fds, _, _ = socket.recv_fds(sock, MESSAGE_BYTES, 2)
+        except socket.timeout:
+            # Don't outlive the agent if it died without closing the socket
+            if os.getppid() != parent_pid:
+                return
+            continue
+        if not message:
+            return
+
+        request = json.loads(message)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            sock.close()
+            _run_child(request, *fds)
+        for fd in fds:
+            os.close(fd)
+        sock.send(json.dumps({"pid": pid}).encode())
+        _, status = os.waitpid(pid, 0)
+        sock.send(json.dumps({"exit_code": os.waitstatus_to_exitcode(status)}).encode())
+
+
+class PythonProcess:
+    """A running script: its pid, the read ends of its stdout/stderr pipes, and how to wait for it."""
+
+    def __init__(self, pid, stdout_fd, stderr_fd):
+        self.pid = pid
+        self.stdout_fd = stdout_fd
+        self.stderr_fd = stderr_fd
+
+    def wait(self):
+        """Block until the script exits and return its exit code (negative for a signal)."""
+        raise NotImplementedError
+
+    def kill(self):
+        try:
+            os.killpg(self.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def close(self):
+        """Close the agent's ends of the output pipes."""
+        for fd in (self.stdout_fd, self.stderr_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class PooledProcess(PythonProcess):
+    def __init__(self, pool, worker, pid, stdout_fd, stderr_fd):
+        super().__init__(pid, stdout_fd, stderr_fd)
+        self.pool = pool
+        self.worker = worker
+
+    def wait(self):
+        try:
+            self.worker.sock.settimeout(None)
+            reply = self.worker.sock.recv(MESSAGE_BYTES)
+            return json.loads(reply)["exit_code"]
+        except (OSError, ValueError, KeyError):
+            self.worker.close()
+            return -signal.SIGKILL
+        finally:
+            self.pool.release(self.worker)
+
+
+class SubprocessProcess(PythonProcess):
+    """Cold fallback: a fresh interpreter per run, for platforms without fork or fd passing."""
+
+    def __init__(self, script, args, cwd, cpu_limit=None, memory_limit=None):
+        preexec = (lambda: _set_limits(cpu_limit, memory_limit)) if os.name == "posix" else None
+        self.process = subprocess.Popen(
+            [sys.executable, script] + list(args),
+            cwd=cwd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            preexec_fn=preexec,
+            start_new_session=os.name == "posix",
+        )
+        super().__init__(self.process.pid, self.process.stdout.fileno(), self.process.stderr.fileno())
+
+    def wait(self):
+        return self.process.wait()
+
+    def close(self):
+        self.process.stdout.close()
+        self.process.stderr.close()
+
+    def kill(self):
+        if os.name == "posix":
+            super().kill()
+        else:
+            self.process.kill()
+
+
+class PoolWorker:
+    def __init__(self, preload):
+        parent_sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), SERVE_FLAG, str(child_sock.fileno()), ",".join(preload)],
+            pass_fds=[child_sock.fileno()],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        child_sock.close()
+        self.sock = parent_sock
+
+    def alive(self):
+        return self.process.poll() is None and self.sock.fileno() != -1
+
+    def start(self, request):
+        """Ask the worker to fork the script; returns (pid, stdout_fd, stderr_fd)."""
+        stdout_r, stdout_w = os.pipe()
+        stderr_r, stderr_w = os.pipe()
+        try:
+            socket.send_fds(self.sock, [json.dumps(request).encode()], [stdout_w, stderr_w])
+        except OSError:
+            for fd in (stdout_r, stderr_r):
+                os.close(fd)
+            raise
+        finally:
+            os.close(stdout_w)
+            os.close(stderr_w)
+        try:
+            reply = json.loads(self.sock.recv(MESSAGE_BYTES))
+            return reply["pid"], stdout_r, stderr_r
+        except (OSError, ValueError, KeyError):
+            for fd in (stdout_r, stderr_r):
+                os.close(fd)
+            raise
+
+    def close(self):
+        self.sock.close()
+        if self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+
+class PythonPool:
+    """Up to `size` warm workers, started on first use. Each runs one script at a time."""
+
+    def __init__(self, size, preload=()):
+        self.size = size
+        self.preload = list(preload)
+        self.idle = queue.Queue()
+        self.workers = []
+        self.lock = threading.Lock()
+
+    def acquire(self, block=True):
+        """An idle worker, starting one if the pool isn't full. Without block, None if all are busy."""
+        while True:
+            try:
+                worker = self.idle.get_nowait()
+            except queue.Empty:
+                with self.lock:
+                    self.workers = [w for w in self.workers if w.alive()]
+                    if len(self.workers) < self.size:
+                        worker = PoolWorker(self.preload)
+                        self.workers.append(worker)
+                        return worker
+                if not block:
+                    return None
+                worker = self.idle.get()
+            if worker.alive():
+                return worker
+            worker.close()
+
+    def release(self, worker):
+        if worker.alive():
+            self.idle.put(worker)
+
+    def start(self, script, args, cwd, cpu_limit=None, memory_limit=None, block=True):
+        worker = self.acquire(block)
+        if worker is None:
+            return None
+        request = {
+            "script": script,
+            "args": list(args),
+            "cwd": cwd,
+            "cpu_limit": cpu_limit,
+            "memory_limit": memory_limit,
+        }
+        try:
+            pid, stdout_fd, stderr_fd = worker.start(request)
+        except (OSError, ValueError, KeyError):
+            worker.close()
+            raise
+        return PooledProcess(self, worker, pid, stdout_fd, stderr_fd)
+
+    def warm_up(self):
+        """Start every worker now instead of on first use."""
+        with self.lock:
+            while len(self.workers) < self.size:
+                worker = PoolWorker(self.preload)
+                self.workers.append(worker)
+                self.idle.put(worker)
+
+    def shutdown(self):
+        with self.lock:
+            for worker in self.workers:
+                worker.close()
+            self.workers = []
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def pool_supported():
+    return hasattr(os, "fork") and hasattr(socket, "send_fds") and hasattr(socket, "AF_UNIX")
+
+
+def get_pool():
+    """The shared pool, or None when it is disabled or unsupported here."""
+    global _pool
+    from config import PYTHON_POOL_SIZE, PYTHON_POOL_PRELOAD
+
+    if not PYTHON_POOL_SIZE or not pool_supported():
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = PythonPool(PYTHON_POOL_SIZE, PYTHON_POOL_PRELOAD)
+            atexit.register(_pool.shutdown)
+        return _pool
+
+
+def start_python(script, args=(), cwd=".", cpu_limit=None, memory_limit=None, use_pool=True, wait_for_pool=True):
+    """Start a Python script, from a warm worker when possible. Returns a PythonProcess.
+
+    With wait_for_pool=False a script that finds every warm worker busy starts a
+    fresh interpreter instead of waiting for one.
+    """
+    pool = get_pool() if use_pool else None
+    if pool is not None:
+        try:
+            process = pool.start(script, args, cwd, cpu_limit, memory_limit, wait_for_pool)
+            if process is not None:
+                return process
+        except (OSError, ValueError, KeyError):
+            pass
+    return SubprocessProcess(script, args, cwd, cpu_limit, memory_limit)
+
+
+if __name__ == "__main__" and len(sys.argv) >= 3 and sys.argv[1] == SERVE_FLAG:
+    serve(int(sys.argv[2]), [m for m in (sys.argv[3] if len(sys.argv) > 3 else "").split(",") if m])
@@ -0,0 +1,193 @@
+import random
+import re
+import time
+from collections import deque
+
+from config import (
+    REQUESTS_PER_MINUTE,
+    TOKENS_PER_MINUTE,
+    MAX_RETRIES,
+    BACKOFF_BASE_SECONDS,
+    BACKOFF_MAX_SECONDS,
+)
+import tracing
+
+# HTTP status codes worth retrying: rate limited, or the service is having a moment
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+WINDOW_SECONDS = 60.0
+
+
+def is_retryable(error):
+    """Return True for rate-limit and transient errors from generate_content."""
+    if getattr(error, "code", None) in RETRYABLE_STATUS:
+        return True
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    try:
+        import httpx
+    except ImportError:
+        return False
+    return isinstance(error, httpx.TransportError)
+
+
+def retry_after(error):
+    """Return the delay the server asked for (RetryInfo / Retry-After), if any."""
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        details = details.get("error", details).get("details", [])
+    for detail in details if isinstance(details, list) else []:
+        delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+        match = re.fullmatch(r"([\d.]+)s", delay or "")
+        if match:
+            return float(match.group(1))
+
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimitScheduler:
+    """Paces generate_content calls against per-minute request and token budgets.
+
+    Requests go out immediately while both budgets have room. When a budget is
+    spent, the next request waits just until enough of the last minute expires.
+    Rate-limit and transient errors are retried with jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute=REQUESTS_PER_MINUTE,
+        tokens_per_minute=TOKENS_PER_MINUTE,
+        max_retries=MAX_RETRIES,
+        base_delay=BACKOFF_BASE_SECONDS,
+        max_delay=BACKOFF_MAX_SECONDS,
+        verbose=False,
+        clock=time.monotonic,
+        sleep=time.sleep,
+        rng=random.random,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.verbose = verbose
+        self.clock = clock
+        self.sleep = sleep
+        self.rng = rng
+        # [sent_at, tokens] for every request in the last minute
+        self.window = deque()
+        # Prompts only grow within a session, so the last one is a good estimate
+        self.last_prompt_tokens = 0
+        self.waited = 0.0
+        self.retries = 0
+
+    def _prune(self, now):
+        while self.window and now - self.window[0][0] >= WINDOW_SECONDS:
+            self.window.popleft()
+
+    def delay_needed(self, now=None):
+        """Seconds to wait before the next request fits in both budgets."""
+        now = self.clock() if now is None else now
+        self._prune(now)
+        delay = 0.0
+
+        if self.requests_per_minute and len(self.window) >= self.requests_per_minute:
+            oldest = self.window[len(self.window) - self.requests_per_minute][0]
+            delay = max(delay, oldest + WINDOW_SECONDS - now)
+
+        if self.tokens_per_minute:
+            needed = min(self.last_prompt_tokens, self.tokens_per_minute)
+            used = sum(tokens for _, tokens in self.window)
+            for sent_at, tokens in self.window:
+                if used + needed <= self.tokens_per_minute:
+                    break
+                used -= tokens
+                delay = max(delay, sent_at + WINDOW_SECONDS - now)
+
+        return delay
+
+    def _wait(self, delay, reason):
+        if delay <= 0:
+            return
+        if self.verbose:
+            print(f"[rate limit] waiting {delay:.1f}s ({reason})")
+        self.waited += delay
+        with tracing.span("rate_limit_wait", "model", seconds=round(delay, 3), reason=reason):
+            self.sleep(delay)
+
+    def backoff_delay(self, attempt, error=None):
+        """Full-jitter exponential backoff, never shorter than what the server asked for."""
+        delay = self.rng() * min(self.max_delay, self.base_delay * 2 ** attempt)
+        server_delay = retry_after(error) if error is not None else None
+        if server_delay is not None:
+            delay = max(delay, min(server_delay, self.max_delay))
+        return delay
+
+    def record(self, entry, response):
+        usage = getattr(response, "usage_metadata", None)
+        prompt_tokens = getattr(usage, "prompt_token_count", None) or 0
+        total_tokens = getattr(usage, "total_token_count", None)
+        if total_tokens is None:
+            total_tokens = prompt_tokens + (getattr(usage, "candidates_token_count", None) or 0)
+        entry[1] = total_tokens
+        self.last_prompt_tokens = max(self.last_prompt_tokens, prompt_tokens)
+
+    def generate_content(self, client, **kwargs):
+        """Call client.models.generate_content(**kwargs) within the budgets."""
+        for attempt in range(self.max_retries + 1):
+            self._wait(self.delay_needed(), "per-minute budget")
+
+            entry = [self.clock(), self.last_prompt_tokens]
+            self.window.append(entry)
+            try:
+                response = client.models.generate_content(**kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                self.retries += 1
+                self._wait(self.backoff_delay(attempt, e), f"retry {attempt + 1} after {e}")
+                continue
+
+            self.record(entry, response)
+            return response
+
+    async def generate_content_async(self, client, **kwargs):
+        """Await client.aio.models.generate_content(**kwargs) within the budgets.
+
+        Sessions sharing the scheduler on one event loop re-check the budgets after
+        every wait, so they can't all take the same free slot.
+        """
+        for attempt in range(self.max_retries + 1):
+            delay = self.delay_needed()
+            while delay > 0:
+                await self._wait_async(delay, "per-minute budget")
+                delay = self.delay_needed()
+
+            entry = [self.clock(), self.last_prompt_tokens]
+            self.window.append(entry)
+            try:
+                response = await client.aio.models.generate_content(**kwargs)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                self.retries += 1
+                await self._wait_async(self.backoff_delay(attempt, e), f"retry {attempt + 1} after {e}")
+                continue
+
+            self.record(entry, response)
+            return response
+
+    async def _wait_async(self, delay, reason):
+        if delay <= 0:
+            return
+        if self.verbose:
+            print(f"[rate limit] waiting {delay:.1f}s ({reason})")
+        self.waited += delay
+        import asyncio
+
+        with tracing.span("rate_limit_wait", "model", seconds=round(delay, 3), reason=reason):
+            await asyncio.sleep(delay)
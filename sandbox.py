@@ -0,0 +1,169 @@
+import errno
+import os
+import stat
+import threading
+from collections import OrderedDict
+
+from config import SANDBOX_CACHE_SIZE, SANDBOX_MAX_DIRECTORIES
+
+# Where openat()-style calls exist, files are opened and stat'ed relative to an
+# open fd of the working directory; elsewhere the same calls take absolute paths
+_USE_DIR_FD = hasattr(os, "O_DIRECTORY") and {os.open, os.stat} <= os.supports_dir_fd
+_NOFOLLOW = getattr(os, "O_NOFOLLOW", 0)
+
+_sandboxes = OrderedDict()
+_sandboxes_lock = threading.Lock()
+
+
+class Sandbox:
+    """The one directory the agent's tools may touch, and how paths inside it are resolved.
+
+    resolve() follows symlinks (os.path.realpath) and accepts a path only if the
+    result is the root or below it, so neither a symlink pointing out nor a
+    sibling such as "calculator2" next to "calculator" gets through. Resolutions
+    are memoized until invalidate(), which the agent calls after every tool that
+    may have changed the tree. Opens and stats then go relative to the root's fd.
+    The last path component is opened with O_NOFOLLOW, so a file swapped for a
+    symlink after resolution fails to open; a directory higher up swapped for a
+    symlink in that window is not caught.
+
+    After invalidate(), or when a call through the fd finds nothing (ENOENT,
+    ESTALE), the root path is checked to still be the directory the fd was
+    opened on; if the working directory was replaced, it is opened again.
+    Writes (write_atomic) still go by absolute path, through resolve() only.
+    """
+
+    def __init__(self, working_directory):
+        self.root = os.path.realpath(working_directory)
+        self.resolved = {}
+        self.generation = 0
+        self.lock = threading.Lock()
+        self.fd = None
+        # fds of replaced roots; another thread may still be using one, so they close with the sandbox
+        self.retired = []
+        self.check_root = False
+        if _USE_DIR_FD:
+            self._open_root()
+
+    def _open_root(self):
+        self.fd = os.open(self.root, os.O_RDONLY | os.O_DIRECTORY)
+        root_stat = os.fstat(self.fd)
+        self.identity = (root_stat.st_dev, root_stat.st_ino)
+
+    def _root_replaced(self):
+        """Reopen the root's fd if the root path now names another directory; True if it did."""
+        root_stat = os.stat(self.root)
+        with self.lock:
+            self.check_root = False
+            if (root_stat.st_dev, root_stat.st_ino) == self.identity:
+                return False
+            self.retired.append(self.fd)
+            self._open_root()
+            self.generation += 1
+            self.resolved.clear()
+            return True
+
+    def _with_dir_fd(self, call):
+        """call(dir_fd), retried once on the new root if the old one turns out to be gone."""
+        if self.check_root:
+            self._root_replaced()
+        try:
+            return call(self.fd)
+        except OSError as e:
+            if e.errno in (errno.ENOENT, errno.ESTALE) and self._root_replaced():
+                return call(self.fd)
+            raise
+
+    def resolve(self, path):
+        """The real absolute path of a path relative to the root, or None if it leads outside."""
+        path = path or "."
+        resolved = self.resolved.get(path)
+        if resolved is not None:
+            return resolved or None
+        generation = self.generation
+        real = os.path.realpath(os.path.join(self.root, path))
+        inside = real == self.root or real.startswith(self.root + os.sep)
+        with self.lock:
+            # A write since this resolution started may have changed the answer
+            if generation == self.generation:
+                if len(self.resolved) >= SANDBOX_CACHE_SIZE:
+                    self.resolved.clear()
+                self.resolved[path] = real if inside else ""
+        return real if inside else None
+
+    def relative(self, real):
+        """A resolved path relative to the root, for dir_fd calls."""
+        return real[len(self.root) + 1:] or "."
+
+    def stat(self, real):
+        if self.fd is None:
+            return os.stat(real)
+        return self._with_dir_fd(lambda dir_fd: os.stat(self.relative(real), dir_fd=dir_fd, follow_symlinks=False))
+
+    def isfile(self, real):
+        try:
+            return stat.S_ISREG(self.stat(real).st_mode)
+        except OSError:
+            return False
+
+    def isdir(self, real):
+        try:
+            return stat.S_ISDIR(self.stat(real).st_mode)
+        except OSError:
+            return False
+
+    def open(self, real, mode="r", **kwargs):
+        """Like open(), for a resolved path."""
+        if self.fd is None:
+            return open(real, mode, **kwargs)
+        return self._with_dir_fd(
+            lambda dir_fd: open(
+                self.relative(real),
+                mode,
+                opener=lambda name, flags: os.open(name, flags | _NOFOLLOW, dir_fd=dir_fd),
+                **kwargs,
+            )
+        )
+
+    def invalidate(self):
+        with self.lock:
+            self.generation += 1
+            self.resolved.clear()
+            # The tool may have replaced the working directory itself
+            self.check_root = self.fd is not None
+
+    def close(self):
+        for fd in self.retired + ([self.fd] if self.fd is not None else []):
+            os.close(fd)
+        self.fd = None
+        self.retired = []
+
+    def __del__(self):
+        # Evicted sandboxes close once the last tool call using one lets go of it
+        self.close()
+
+
+def get_sandbox(working_directory):
+    """The Sandbox for a working directory, made on first use and then shared.
+
+    Sandboxes are keyed by the working_directory string as given, so the lookup
+    costs no realpath; the least recently used one is dropped once there are
+    more than SANDBOX_MAX_DIRECTORIES.
+    """
+    with _sandboxes_lock:
+        sandbox = _sandboxes.get(working_directory)
+        if sandbox is None:
+            sandbox = _sandboxes[working_directory] = Sandbox(working_directory)
+            while len(_sandboxes) > SANDBOX_MAX_DIRECTORIES:
+                _sandboxes.popitem(last=False)
+        else:
+            _sandboxes.move_to_end(working_directory)
+        return sandbox
+
+
+def invalidate():
+    """Forget every resolved path; a tool may have added, removed or replaced files or symlinks."""
+    with _sandboxes_lock:
+        sandboxes = list(_sandboxes.values())
+    for sandbox in sandboxes:
+        sandbox.invalidate()
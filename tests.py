@@ -1,7 +1,16 @@
+import tempfile
 from functions.get_files_info import get_files_info
 from functions.get_file_content import get_file_content
 from functions.write_file import write_file
+from functions.edit_file import edit_file
 from functions.run_python_file import run_python_file
+from functions.search_code import search_code
+from rate_limiter import RateLimitScheduler
+from checkpoint import SessionCheckpoint
+from condense import condense
+from prefetch import Prefetcher
+from affected_tests import AffectedTests
+from tool_cache import tool_cache
 
 
 def test():
@@ -18,6 +27,18 @@ def test():
     print("Result for '/bin' directory:")
     print(result)
 
+    result = get_files_info("calculator", ".", recursive=True, limit=2)
+    print("Result for a recursive listing limited to 2 entries:")
+    print(result)
+
+    result = get_files_info("calculator", ".", recursive=True, limit=-1)
+    print("Result for limit=-1:")
+    print(result)
+
+    result = get_files_info("calculator", ".", recursive=True, include=["*.py"])
+    print("Result for all Python files under the current directory:")
+    print(result)
+
     # result = get_files_info("calculator", "../")
     # print("Result for '../' directory:")
     # print(result)
@@ -33,6 +54,36 @@ def test():
     # result = get_file_content("calculator", "pkg/calculator.py")
     # print("Result for 'calculator.py' file:")
     # print(result)
+
+    result = get_file_content("calculator", "pkg/calculator.py", start_line=18, end_line=22)
+    print("Result for lines 18-22 of 'calculator.py':")
+    print(result)
+
+    result = get_file_content("calculator", "pkg/calculator.py", offset=0, length=40)
+    print("Result for the first 40 bytes of 'calculator.py':")
+    print(result)
+
+    result = search_code("calculator", "def render")
+    print("Result for searching 'def render':")
+    print(result)
+
+    result = search_code("calculator", r"self\.(operators|precedence)\[", regex=True)
+    print("Result for a regex search:")
+    print(result)
+
+    result = run_python_file("calculator", "tests.py", ["-v"])
+    print("Result for running 'tests.py -v':")
+    print(result)
+
+    with tempfile.TemporaryDirectory() as scratch:
+        write_file(scratch, "notes.txt", "alpha\nbeta\ngamma\n")
+        result = edit_file(scratch, "notes.txt", diff="@@ -2,2 +2,2 @@\n beta\n-gamma\n+delta\n")
+        print("Result for editing 'notes.txt' with a unified diff:")
+        print(result)
+
+        result = edit_file(scratch, "notes.txt", edits=[{"search": "gamma", "replace": "omega"}])
+        print("Result for an edit whose search text is gone:")
+        print(result)
     
     # result = write_file("calculator", "lorem.txt", "wait, this isn't lorem ipsum")
     # print(result)
@@ -58,6 +109,281 @@ def test():
     # print(result)
 
 
+class FakeRateLimitError(Exception):
+    def __init__(self, code):
+        super().__init__(f"{code} RESOURCE_EXHAUSTED")
+        self.code = code
+
+
+class FakeUsage:
+    def __init__(self, tokens):
+        self.prompt_token_count = tokens
+        self.candidates_token_count = 0
+        self.total_token_count = tokens
+
+
+class FakeResponse:
+    def __init__(self, tokens):
+        self.usage_metadata = FakeUsage(tokens)
+
+
+class FakeClient:
+    """Stands in for genai.Client: fails with the queued errors, then answers."""
+
+    def __init__(self, clock, errors=(), latency=0.0, tokens=100):
+        self.models = self
+        self.clock = clock
+        self.errors = list(errors)
+        self.latency = latency
+        self.tokens = tokens
+        self.calls = 0
+
+    def generate_content(self, **kwargs):
+        self.calls += 1
+        self.clock.now += self.latency
+        if self.errors:
+            raise self.errors.pop(0)
+        return FakeResponse(self.tokens)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_rate_limiter():
+    clock = FakeClock()
+    client = FakeClient(clock, errors=[FakeRateLimitError(429), FakeRateLimitError(503)], latency=0.5)
+    scheduler = RateLimitScheduler(clock=clock, sleep=clock.sleep, rng=lambda: 1.0)
+    scheduler.generate_content(client)
+    print(f"Two transient errors: {client.calls} calls, {scheduler.retries} retries, waited {scheduler.waited:.1f}s")
+
+    clock = FakeClock()
+    client = FakeClient(clock, latency=0.5)
+    scheduler = RateLimitScheduler(requests_per_minute=3, clock=clock, sleep=clock.sleep)
+    for _ in range(4):
+        scheduler.generate_content(client)
+    print(f"4 requests at 3 RPM: waited {scheduler.waited:.1f}s")
+
+    clock = FakeClock()
+    client = FakeClient(clock, tokens=600)
+    scheduler = RateLimitScheduler(tokens_per_minute=1000, clock=clock, sleep=clock.sleep)
+    for _ in range(2):
+        scheduler.generate_content(client)
+    print(f"2 x 600 tokens at 1000 TPM: waited {scheduler.waited:.1f}s")
+
+    clock = FakeClock()
+    client = FakeClient(clock, errors=[ValueError("bad request")])
+    scheduler = RateLimitScheduler(clock=clock, sleep=clock.sleep)
+    try:
+        scheduler.generate_content(client)
+    except ValueError as e:
+        print(f"Non-retryable error raised right away: {e}")
+
+
+def test_checkpoint():
+    from main import run_session
+    from model_backend import ReplayBackend
+
+    with tempfile.TemporaryDirectory() as scratch:
+        backend = ReplayBackend("transcripts/calculator_review.jsonl", latency=0)
+        checkpoint = SessionCheckpoint.create(backend.prompt, "./calculator", directory=scratch)
+        stats = run_session(backend, backend.prompt, checkpoint=checkpoint)
+        restored = SessionCheckpoint.load(checkpoint.session_id, directory=scratch)
+        print(f"Checkpoint after {restored.iterations} iterations: {len(restored.messages)} messages "
+              f"(session had {checkpoint.saved}), finished={restored.finished}, "
+              f"tool calls {restored.stats['tool_calls']} == {stats.tool_calls}")
+
+        with open(checkpoint.path, "a") as file:
+            file.write('{"messages": [{"type": "Cont')
+        torn = SessionCheckpoint.load(checkpoint.path)
+        print(f"Torn last line ignored: {torn.iterations} iterations, {len(torn.messages)} messages")
+        stats.iterations += 1
+        torn.save(torn.messages + restored.messages[-1:], stats)
+        resumed = SessionCheckpoint.load(checkpoint.path)
+        print(f"Saved after the torn line: {resumed.iterations} iterations, {len(resumed.messages)} messages")
+
+
+def test_record_resume():
+    import contextlib
+    import io
+    import os
+    import shutil
+    from main import open_session, parse_args, run_session
+    from model_backend import ReplayBackend, ReplayExhausted
+
+    transcript = "transcripts/calculator_review.jsonl"
+    with tempfile.TemporaryDirectory() as scratch:
+        shutil.copytree("calculator", os.path.join(scratch, "calculator"))
+        recorded = os.path.join(scratch, "recorded.jsonl")
+        # A transcript that runs out after two model calls stands in for an interrupted session
+        short = os.path.join(scratch, "short.jsonl")
+        with open(transcript) as source, open(short, "w") as file:
+            file.writelines(source.readlines()[:2])
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            prompt, _, options = parse_args(["--replay", short, "--replay-latency", "0", "--record", recorded, "Review"])
+            _, working_directory, checkpoint, backend = open_session(prompt, False, options, None, scratch)
+            try:
+                run_session(backend, prompt, False, options, working_directory, checkpoint)
+            except ReplayExhausted:
+                pass
+            argv = ["--resume", checkpoint.session_id, "--replay", transcript, "--replay-latency", "0", "--record", recorded]
+            prompt, _, options = parse_args(argv)
+            prompt, working_directory, checkpoint, backend = open_session(prompt, False, options, None, scratch)
+            resumed = run_session(backend, prompt, False, options, working_directory, checkpoint)
+
+            replay = ReplayBackend(recorded, latency=0)
+            replayed = run_session(replay, replay.prompt, working_directory=working_directory)
+        print(f"Recorded across --resume: {len(replay.entries)} exchanges, replayed from the start in "
+              f"{replayed.iterations} iterations (resumed session: {resumed.iterations}), "
+              f"same answer: {replayed.final_response == resumed.final_response}")
+
+
+def test_condense():
+    output = "\n".join(f"test_{i} (tests.T.test_{i}) ... ok" for i in range(40))
+    output += "\ntest_div (tests.T.test_div) ... FAIL   \n" + "  File \"x.py\", line 3, in f\n    f()\n" * 30
+    result = condense("run_python_file", output)
+    print(f"Condensed run_python_file output ({len(output)} -> {len(result)} chars):")
+    print(result)
+
+
+def test_line_index_threads():
+    import os
+    import random
+    from concurrent.futures import ThreadPoolExecutor
+
+    with tempfile.TemporaryDirectory() as scratch:
+        with open(os.path.join(scratch, "big.txt"), "w") as file:
+            file.writelines(f"line {i}\n" for i in range(1, 200_001))
+        lines = random.Random(0).sample(range(1, 200_001), 80)
+
+        def read(line):
+            return get_file_content(scratch, "big.txt", start_line=line, end_line=line).split("\n")[0] == f"line {line}"
+
+        with ThreadPoolExecutor(4) as pool:
+            correct = sum(pool.map(read, lines))
+        print(f"Lines read from 4 threads at once: {correct} of {len(lines)} correct")
+
+
+def test_sandbox():
+    import os
+    import sandbox
+
+    with tempfile.TemporaryDirectory() as scratch:
+        work = os.path.join(scratch, "work")
+        os.makedirs(os.path.join(scratch, "work2"))
+        os.makedirs(work)
+        with open(os.path.join(scratch, "work2", "secret.txt"), "w") as file:
+            file.write("secret")
+        os.symlink(os.path.join(scratch, "work2"), os.path.join(work, "link"))
+        write_file(work, "inside.txt", "inside")
+        os.symlink("inside.txt", os.path.join(work, "alias.txt"))
+
+        print("Sibling directory with the same prefix:")
+        print(get_file_content(work, "../work2/secret.txt"))
+        print("Symlink pointing outside:")
+        print(get_file_content(work, "link/secret.txt"))
+        print(write_file(work, "link/new.txt", "x"))
+        print("Symlink pointing inside:")
+        print(get_file_content(work, "alias.txt"))
+
+        os.rename(work, work + ".old")
+        os.makedirs(work)
+        write_file(work, "inside.txt", "replaced")
+        # As call_function does after every write
+        sandbox.invalidate()
+        print("Working directory replaced:")
+        print(get_file_content(work, "inside.txt"))
+
+
+def test_daemon():
+    import asyncio
+    import json
+    import os
+    import socket
+    import sys
+    import threading
+    import time
+    from daemon import AgentDaemon, SessionOutput
+    from model_backend import ReplayBackend
+
+    with tempfile.TemporaryDirectory() as scratch:
+        socket_path = os.path.join(scratch, "agent.sock")
+        # Sessions without --replay get the fake backend instead of the live model
+        daemon = AgentDaemon(
+            socket_path, make_gemini_backend=lambda: ReplayBackend("transcripts/calculator_review.jsonl", latency=0)
+        )
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, daemon=True).start()
+        serving = asyncio.run_coroutine_threadsafe(daemon.serve(), loop)
+        while not os.path.exists(socket_path):
+            time.sleep(0.01)
+
+        stdout = sys.stdout
+        sys.stdout = SessionOutput(stdout)
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                connection.connect(socket_path)
+                connection.sendall((json.dumps({"argv": ["review the calculator"], "cwd": os.getcwd()}) + "\n").encode())
+                events = [json.loads(line) for line in connection.makefile("r")]
+        finally:
+            sys.stdout = stdout
+            serving.cancel()
+
+        output = "".join(event["text"] for event in events if event["event"] == "output")
+        steps = [event["event"] for event in events if event["event"] in ("model", "tools")]
+        print(f"Daemon session: {len(steps)} steps ({' '.join(steps)}), done: {events[-1]['exit_code']}, "
+              f"iterations {events[-1]['stats']['iterations']}")
+        print(output.strip().splitlines()[-1])
+
+
+def test_prefetch():
+    prefetcher = Prefetcher(max_files=4)
+    prefetcher.schedule("calculator", "pkg", get_files_info("calculator", "pkg"))
+    key = tool_cache.key("get_file_content", {"working_directory": "calculator", "file_path": "pkg/render.py"})
+    result = prefetcher.get(key)
+    print(f"Prefetched pkg/render.py: {result == get_file_content('calculator', 'pkg/render.py')}")
+    print(prefetcher.format_stats())
+
+
+def test_run_tests():
+    import os
+    import shutil
+
+    with tempfile.TemporaryDirectory() as scratch:
+        work = os.path.join(scratch, "calculator")
+        shutil.copytree("calculator", work)
+        tracker = AffectedTests(work, cache_dir=scratch)
+        for label in ["First run", "Nothing changed"]:
+            run = tracker.run()
+            print(f"{label}: {len(run.ran)} ran, {len(run.cached)} cached, {len(run.failed)} failed")
+
+        write_file(work, "pkg/render.py", get_file_content(work, "pkg/render.py") + "\n")
+        tracker.notify_write("pkg/render.py")
+        run = tracker.run()
+        print(f"pkg/render.py written: {len(run.ran)} ran, {len(run.cached)} cached (the tests don't import it)")
+
+        write_file(work, "pkg/calculator.py", get_file_content(work, "pkg/calculator.py") + "\n")
+        tracker.notify_write("pkg/calculator.py")
+        run = tracker.run()
+        print(f"pkg/calculator.py written: {len(run.ran)} ran, {len(run.cached)} cached, changed {run.changed}")
+
 
 if __name__ == "__main__":
-    test()
\ No newline at end of file
+    test()
+    test_rate_limiter()
+    test_checkpoint()
+    test_record_resume()
+    test_condense()
+    test_prefetch()
+    test_line_index_threads()
+    test_sandbox()
+    test_run_tests()
+    test_daemon()
\ No newline at end of file
@@ -0,0 +1,122 @@
+import json
+import threading
+from collections import OrderedDict
+
+from config import TOOL_CACHE_MAX_BYTES
+from sandbox import get_sandbox
+
+# Read-only tools whose results can be reused, and the argument naming their path
+CACHEABLE_FUNCTIONS = {
+    "get_files_info": "directory",
+    "get_file_content": "file_path",
+}
+# Tools that write the one file named by their file_path argument
+WRITE_FUNCTIONS = {"write_file", "edit_file"}
+# Tools that may change the tree. Running any of them empties the cache.
+INVALIDATING_FUNCTIONS = WRITE_FUNCTIONS | {"run_python_file", "run_tests"}
+
+
+class ToolResultCache:
+    """LRU cache of read-only tool results, bounded by the total size of the results.
+
+    Entries are keyed by the resolved path plus its (mtime_ns, size, inode), so a file
+    changed behind the agent's back is simply a miss. Directory listings are keyed on
+    the directory's own stat, which changes when entries are added or removed but not
+    when a file inside grows; tool writes empty the cache to cover that. Recursive
+    listings are not cached: a change in a subdirectory leaves that stat as it was.
+    """
+
+    def __init__(self, max_bytes=TOOL_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def key(self, function_name, args):
+        """Return the cache key for a call, or None if the call can't be cached."""
+        path_arg = CACHEABLE_FUNCTIONS.get(function_name)
+        if path_arg is None:
+            return None
+        if function_name == "get_files_info" and args.get("recursive"):
+            return None
+        try:
+            sandbox = get_sandbox(args["working_directory"])
+            path = sandbox.resolve(args.get(path_arg))
+            if path is None:
+                return None
+            stat = sandbox.stat(path)
+        except OSError:
+            return None
+
+        other_args = {k: v for k, v in args.items() if k not in ("working_directory", path_arg)}
+        return (
+            function_name,
+            sandbox.root,
+            path,
+            stat.st_mtime_ns,
+            stat.st_size,
+            stat.st_ino,
+            json.dumps(other_args, sort_keys=True, default=str),
+        )
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def put(self, key, result):
+        size = len(result.encode("utf-8", errors="replace")) if isinstance(result, str) else 0
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (result, size)
+            self.total_bytes += size
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self):
+        with self.lock:
+            if self.entries:
+                self.invalidations += 1
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+        }
+
+    def format_stats(self):
+        stats = self.stats()
+        lookups = stats["hits"] + stats["misses"]
+        hit_rate = f"{stats['hits'] / lookups:.0%}" if lookups else "n/a"
+        return (
+            f"Tool cache: {stats['hits']} hits, {stats['misses']} misses ({hit_rate} hit rate), "
+            f"{stats['evictions']} evictions, {stats['invalidations']} invalidations, "
+            f"{stats['entries']} entries / {stats['bytes']} bytes"
+        )
+
+
+tool_cache = ToolResultCache()
@@ -0,0 +1,162 @@
+import importlib
+import inspect
+import re
+import threading
+import typing
+
+# Importing these modules registers the agent's tools, in this order
+TOOL_MODULES = [
+    "functions.get_files_info",
+    "functions.get_file_content",
+    "functions.search_code",
+    "functions.write_file",
+    "functions.edit_file",
+    "functions.run_python_file",
+    "functions.run_tests",
+]
+# Filled in by the agent itself, never declared to the model
+INJECTED_ARGS = {"working_directory"}
+
+SCALAR_TYPES = {str: "STRING", int: "INTEGER", float: "NUMBER", bool: "BOOLEAN"}
+SECTION_HEADERS = ("Args:", "Arguments:", "Attributes:")
+
+_tools = {}
+_tool_declaration = None
+_lock = threading.Lock()
+
+
+class ToolSpec:
+    """A registered tool: its function and the declaration derived from it, as plain data."""
+
+    def __init__(self, name, function, declaration):
+        self.name = name
+        self.function = function
+        self.declaration = declaration
+
+
+def parse_docstring(docstring):
+    """Split a Google-style docstring into (description, {argument: description})."""
+    description, arguments = [], {}
+    current = None
+    in_section = False
+    for line in inspect.cleandoc(docstring or "").splitlines():
+        stripped = line.strip()
+        if stripped in SECTION_HEADERS:
+            in_section = True
+            continue
+        if not in_section:
+            description.append(stripped)
+            continue
+        match = re.match(r"^(\w+)(?: \([^)]*\))?:\s*(.*)$", stripped)
+        if match and not line.startswith(" " * 8):
+            current = match.group(1)
+            arguments[current] = [match.group(2)]
+        elif current and stripped:
+            arguments[current].append(stripped)
+    return _join(description), {name: _join(lines) for name, lines in arguments.items()}
+
+
+def _join(lines):
+    return " ".join(" ".join(lines).split())
+
+
+def schema_for(annotation, description=None):
+    """A JSON-style Gemini schema for a parameter annotation."""
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin is typing.Union or type(annotation).__name__ == "UnionType":
+        # Optional[X] / X | None: the model simply leaves it out
+        options = [arg for arg in args if arg is not type(None)]
+        if len(options) != 1:
+            raise TypeError(f"unsupported union type {annotation!r}")
+        return schema_for(options[0], description)
+
+    if annotation in SCALAR_TYPES:
+        schema = {"type": SCALAR_TYPES[annotation]}
+    elif origin is typing.Literal:
+        schema = {"type": "STRING", "enum": [str(arg) for arg in args]}
+    elif origin is list:
+        schema = {"type": "ARRAY", "items": schema_for(args[0] if args else str)}
+    elif typing.is_typeddict(annotation):
+        _, field_docs = parse_docstring(annotation.__doc__)
+        schema = {
+            "type": "OBJECT",
+            "properties": {
+                field: schema_for(field_type, field_docs.get(field))
+                for field, field_type in typing.get_type_hints(annotation).items()
+            },
+        }
+    else:
+        raise TypeError(f"no schema type for annotation {annotation!r}")
+
+    if description:
+        schema["description"] = description
+    return schema
+
+
+def _declare(function, name, hidden):
+    description, argument_docs = parse_docstring(function.__doc__)
+    if not description:
+        raise TypeError(f"tool {name} needs a docstring describing it")
+    hints = typing.get_type_hints(function)
+
+    properties, required = {}, []
+    for parameter in inspect.signature(function).parameters.values():
+        if parameter.name in hidden:
+            continue
+        if parameter.name not in hints:
+            raise TypeError(f"tool {name}: parameter {parameter.name} needs a type annotation")
+        properties[parameter.name] = schema_for(hints[parameter.name], argument_docs.get(parameter.name))
+        if parameter.default is inspect.Parameter.empty:
+            required.append(parameter.name)
+
+    parameters = {"type": "OBJECT", "properties": properties}
+    if required:
+        parameters["required"] = required
+    return {"name": name, "description": description, "parameters": parameters}
+
+
+def tool(name=None, hidden=()):
+    """Register a function as an agent tool.
+
+    The declaration the model sees is derived once, here: the docstring summary
+    is the tool's description, its Args: section describes the parameters, the
+    annotations give their types (Literal for enums, TypedDict for objects), and
+    parameters without a default are required. working_directory and any
+    `hidden` parameters are left out; the agent fills those in itself.
+    """
+
+    def register(function):
+        tool_name = name or function.__name__
+        declaration = _declare(function, tool_name, INJECTED_ARGS | set(hidden))
+        _tools[tool_name] = ToolSpec(tool_name, function, declaration)
+        return function
+
+    return register
+
+
+def load_tools():
+    """Import the tool modules (once) and return {name: ToolSpec}."""
+    for module in TOOL_MODULES:
+        importlib.import_module(module)
+    return _tools
+
+
+def tool_functions():
+    return {name: spec.function for name, spec in load_tools().items()}
+
+
+def build_tool():
+    """The types.Tool declaring every registered tool. Built on first use, then reused."""
+    global _tool_declaration
+    with _lock:
+        if _tool_declaration is None:
+            from google.genai import types
+
+            _tool_declaration = types.Tool(
+                function_declarations=[
+                    types.FunctionDeclaration.model_validate(spec.declaration)
+                    for spec in load_tools().values()
+                ]
+            )
+        return _tool_declaration
@@ -0,0 +1,152 @@
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+# The session the current code runs for. Context variables follow asyncio tasks
+# and asyncio.to_thread; dispatch copies the context into its worker threads.
+_current_session = contextvars.ContextVar("trace_session", default=None)
+_tracer = None
+
+
+class Tracer:
+    """Spans and counters from every session in this process, kept as Chrome trace events.
+
+    Open the file written by write() in chrome://tracing or https://ui.perfetto.dev.
+    Each session is its own process lane, and each thread a row within it.
+    """
+
+    def __init__(self, trace_path=None, metrics_path=None):
+        self.trace_path = trace_path
+        self.metrics_path = metrics_path
+        self.origin = time.perf_counter()
+        self.events = []
+        self.lock = threading.Lock()
+        self.sessions = 0
+
+    def timestamp(self, at=None):
+        return round(((time.perf_counter() if at is None else at) - self.origin) * 1e6, 1)
+
+    def add(self, event):
+        with self.lock:
+            self.events.append(event)
+
+    def write(self):
+        if not self.trace_path:
+            return
+        directory = os.path.dirname(self.trace_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            events = list(self.events)
+        with open(self.trace_path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+class SessionTrace:
+    """Running totals for one session, written to the metrics sink when it ends."""
+
+    def __init__(self, tracer, number, label):
+        self.tracer = tracer
+        self.number = number
+        self.label = label
+        self.spans = {}
+
+    def record(self, category, name, seconds, args):
+        totals = self.spans.setdefault(f"{category}/{name}", {"count": 0, "seconds": 0.0})
+        totals["count"] += 1
+        totals["seconds"] += seconds
+        for key in ("result_bytes", "args_bytes", "condensed_bytes"):
+            if key in args:
+                totals[key] = totals.get(key, 0) + args[key]
+
+
+def enable(trace_path=None, metrics_path=None):
+    """Start collecting. trace_path gets a Chrome trace, metrics_path one JSON line per session."""
+    global _tracer
+    _tracer = Tracer(trace_path, metrics_path)
+    return _tracer
+
+
+def finish():
+    """Write the Chrome trace, if one was asked for."""
+    if _tracer is not None:
+        _tracer.write()
+
+
+@contextlib.contextmanager
+def session(stats, label=""):
+    """Trace one agent session; its SessionStats plus span totals go to the metrics sink."""
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.lock:
+        _tracer.sessions += 1
+        number = _tracer.sessions
+    current = SessionTrace(_tracer, number, label)
+    _tracer.add({"ph": "M", "name": "process_name", "pid": number, "args": {"name": f"session {number}: {label[:60]}"}})
+    token = _current_session.set(current)
+    try:
+        with span("session", "agent"):
+            yield current
+    finally:
+        _current_session.reset(token)
+        if _tracer.metrics_path:
+            _write_metrics(_tracer.metrics_path, current, stats)
+
+
+def _write_metrics(path, current, stats):
+    record = {
+        "time": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "session": current.number,
+        "prompt": current.label,
+    }
+    record.update({key: value for key, value in stats.as_dict().items() if key != "final_response"})
+    record["spans"] = current.spans
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with _tracer.lock, open(path, "a") as file:
+        file.write(json.dumps(record) + "\n")
+
+
+@contextlib.contextmanager
+def span(name, category, **args):
+    """Time a block as a complete ("X") trace event. Yields a dict for args known only at the end."""
+    current = _current_session.get()
+    if current is None:
+        yield args
+        return
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        end = time.perf_counter()
+        tracer = current.tracer
+        tracer.add({
+            "ph": "X",
+            "name": name,
+            "cat": category,
+            "ts": tracer.timestamp(start),
+            "dur": round((end - start) * 1e6, 1),
+            "pid": current.number,
+            "tid": threading.get_ident(),
+            "args": args,
+        })
+        current.record(category, name, end - start, args)
+
+
+def counter(name, **values):
+    """Record a counter ("C") event, drawn as a graph of its values over time."""
+    current = _current_session.get()
+    if current is not None:
+        current.tracer.add({
+            "ph": "C",
+            "name": name,
+            "ts": current.tracer.timestamp(),
+            "pid": current.number,
+            "args": values,
+        })
@@ -0,0 +1,110 @@
+# Runs a list of unittest cases for run_tests, in a pool child or a fresh interpreter.
+#
+# Arguments are the path to write the results to (a JSON list), then test ids,
+# "<file>::<Class>.<method>" with the file relative to the working directory.
+# Each test file is imported the way `python3 file.py` would see it (its
+# directory first on sys.path). Whatever the tests print is left on stdout and
+# stderr, which run_tests only shows if the run itself broke.
+#
+# Only the standard library is imported here.
+
+import importlib.util
+import json
+import os
+import sys
+import time
+import traceback
+import unittest
+
+
+class RecordingResult(unittest.TestResult):
+    """Keeps each case's outcome, duration and failure text."""
+
+    def __init__(self, file_path):
+        super().__init__()
+        self.file_path = file_path
+        self.records = {}
+        self.started = {}
+
+    def _id(self, test):
+        name = getattr(test, "_testMethodName", None)
+        if name is None:
+            # setUpClass/setUpModule failures are reported on a placeholder
+            return f"{self.file_path}::{test.id()}"
+        return f"{self.file_path}::{type(test).__name__}.{name}"
+
+    def _record(self, test, outcome, details=""):
+        test_id = self._id(test)
+        record = self.records.get(test_id)
+        # A failed subtest makes the whole case fail, even if later ones pass
+        if record and record["outcome"] in ("failure", "error"):
+            return
+        start = self.started.get(test_id, time.perf_counter())
+        self.records[test_id] = {
+            "id": test_id,
+            "outcome": outcome,
+            "duration": time.perf_counter() - start,
+            "details": details,
+        }
+
+    def startTest(self, test):
+        super().startTest(test)
+        self.started[self._id(test)] = time.perf_counter()
+
+    def addSuccess(self, test):
+        self._record(test, "passed")
+
+    def addFailure(self, test, err):
+        self._record(test, "failure", self._exc_info_to_string(err, test))
+
+    def addError(self, test, err):
+        self._record(test, "error", self._exc_info_to_string(err, test))
+
+    def addSkip(self, test, reason):
+        self._record(test, "skipped", reason)
+
+    def addExpectedFailure(self, test, err):
+        self._record(test, "passed")
+
+    def addUnexpectedSuccess(self, test):
+        self._record(test, "failure", "unexpected success")
+
+    def addSubTest(self, test, subtest, err):
+        if err is not None:
+            outcome = "failure" if issubclass(err[0], test.failureException) else "error"
+            self._record(test, outcome, f"{subtest}\n{self._exc_info_to_string(err, test)}")
+
+
+def run(results_path, test_ids):
+    by_file = {}
+    for test_id in test_ids:
+        file_path, name = test_id.split("::", 1)
+        by_file.setdefault(file_path, []).append(name)
+
+    records = []
+    for file_path, names in by_file.items():
+        sys.path.insert(0, os.path.dirname(os.path.abspath(file_path)))
+        module_name = os.path.splitext(os.path.basename(file_path))[0]
+        try:
+            spec = importlib.util.spec_from_file_location(module_name, file_path)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[module_name] = module
+            spec.loader.exec_module(module)
+            suite = unittest.TestLoader().loadTestsFromNames(names, module)
+        except Exception:
+            details = traceback.format_exc()
+            records += [
+                {"id": f"{file_path}::{name}", "outcome": "error", "duration": 0.0, "details": details}
+                for name in names
+            ]
+            continue
+        result = RecordingResult(file_path)
+        suite.run(result)
+        records += result.records.values()
+
+    with open(results_path, "w") as file:
+        json.dump(records, file)
+
+
+if __name__ == "__main__":
+    run(sys.argv[1], sys.argv[2:])